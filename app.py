@@ -1,8 +1,21 @@
 
-from flask import Flask, request, send_file, render_template, redirect, url_for, abort, send_from_directory, jsonify
-import os, uuid, shutil
-from utils.pdf_tools import merge_pdfs, split_pdf, compress_pdf, images_to_pdf, pdf_to_word, rotate_pdf, add_watermark, annotate_pdf, pdf_to_images, url_to_pdf, extract_text, add_password, remove_password, fill_form, redact_text, replace_text, add_highlight, add_text_stamp, edit_text_in_pdf, add_page_numbers, crop_pdf, reorder_pages, pdf_to_ppt, extract_pages, pdf_to_excel, compare_pdfs, smart_redact, fake_scan, make_booklet, remove_annotations
+from flask import Flask, request, send_file, render_template, redirect, url_for, abort, send_from_directory, jsonify, after_this_request, Response, stream_with_context, g
+import os, re, uuid, zipfile, json, time
+from functools import partial, wraps
+from utils.pdf_tools import merge_pdfs, iter_split_parts, plan_split, compress_pdf, images_to_pdf, pdf_to_word, rotate_pdf, add_watermark, annotate_pdf, url_to_pdf, iter_text, parse_page_ranges, add_password, remove_password, fill_form, redact_text, replace_text, add_highlight, add_text_stamp, edit_text_in_pdf, add_page_numbers, crop_pdf, reorder_pages, pdf_to_ppt, extract_pages, pdf_to_excel, compare_pdfs, smart_redact, fake_scan, make_booklet, remove_annotations, count_pages
 from utils.ppt_tools import create_ppt_with_image, add_text_to_ppt, get_layouts, add_slide_to_presentation
+from utils.jobs import JobQueue, QueueFull
+from utils.storage import UploadStore
+from utils.raster import iter_page_images, FORMATS as IMAGE_FORMATS
+from utils.zipstream import stream_zip
+from utils.compress import PRESETS as COMPRESSION_PRESETS
+from utils.tables import OUTPUT_FORMATS as TABLE_FORMATS
+from utils.thumbnails import ThumbnailCache, cached_thumbnail, cached_sprite
+from utils.pipeline import run_pipeline, validate_steps, PipelineError
+from utils.batch import OPERATIONS as BATCH_OPERATIONS, prepare as prepare_batch, run_batch
+from utils.textindex import TextIndex
+from utils.lifecycle import StorageArea, Janitor, shard_path, find_path
+from utils.metrics import Registry, CONTENT_TYPE as METRICS_CONTENT_TYPE, BYTES, PAGES, RATE
 from pptx import Presentation
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
@@ -11,6 +24,154 @@ OUTPUT_DIR = os.path.abspath("outputs")
 
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(OUTPUT_DIR, exist_ok=True)
+upload_store = UploadStore(UPLOAD_DIR)
+thumbnail_cache = ThumbnailCache(os.path.abspath("cache/thumbnails"), max_bytes=int(os.environ.get('THUMBNAIL_CACHE_MB', 256)) * 1024 * 1024)
+# Storage lifecycle: session uploads expire UPLOAD_TTL_HOURS after their last
+# use, outputs OUTPUT_TTL_MINUTES after they were written, and past
+# STORAGE_QUOTA_MB (0 = no quota) the least recently used files go first
+UPLOAD_TTL_HOURS = float(os.environ.get('UPLOAD_TTL_HOURS', 24))
+# Positional text indexes of uploads, kept TEXT_INDEX_TTL_HOURS after their last use
+text_index = TextIndex(os.path.abspath("cache/textindex"))
+# State of /jobs, shared by all web workers; kept as long as uploads
+JOB_STATE_DIR = os.path.abspath("cache/jobs")
+janitor = Janitor([
+    StorageArea(UPLOAD_DIR, UPLOAD_TTL_HOURS * 3600, in_use=upload_store.in_use),
+    StorageArea(OUTPUT_DIR, float(os.environ.get('OUTPUT_TTL_MINUTES', 60)) * 60),
+    StorageArea(text_index.root, float(os.environ.get('TEXT_INDEX_TTL_HOURS', UPLOAD_TTL_HOURS)) * 3600),
+    StorageArea(JOB_STATE_DIR, UPLOAD_TTL_HOURS * 3600),
+], quota_bytes=int(os.environ.get('STORAGE_QUOTA_MB', 0)) * 1024 * 1024,
+   interval=int(os.environ.get('JANITOR_INTERVAL', 300)))
+janitor.start()
+
+# Per-process metrics, exposed on /metrics
+registry = Registry()
+UPLOAD_SECONDS = registry.histogram("pdftools_upload_save_seconds", "Time spent storing uploaded files, per request")
+PROCESSING_SECONDS = registry.histogram("pdftools_processing_seconds", "Time spent in the view excluding upload saving, plus streaming the body")
+OUTPUT_BYTES = registry.histogram("pdftools_output_bytes", "Response body size", BYTES)
+INPUT_PAGES = registry.histogram("pdftools_input_pages", "Pages in the uploaded PDFs, per successful request", PAGES)
+PAGES_PER_SECOND = registry.histogram("pdftools_pages_per_second", "Input pages divided by processing time, per successful request", RATE)
+IN_FLIGHT = registry.gauge("pdftools_in_flight_requests", "Requests currently being handled")
+registry.counter("pdftools_janitor_removed_files_total", "Files removed by the storage janitor", collect=lambda: {
+    (("reason", reason),): count for reason, count in janitor.removed.items()
+})
+# Measured by the janitor on each sweep, so scrapes never walk the directories
+registry.gauge("pdftools_disk_usage_bytes", "Bytes stored under each data directory, as of the last janitor sweep", collect=lambda: {
+    (("dir", label),): janitor.usage[root]
+    for label, root in (("uploads", UPLOAD_DIR), ("outputs", OUTPUT_DIR)) if root in janitor.usage
+})
+
+def store_upload(file):
+    """
+    upload_store.save, timed for /metrics. Returns the blob path.
+    """
+    started = time.perf_counter()
+    path = upload_store.save(file)
+    g.upload_seconds = g.get('upload_seconds', 0.0) + time.perf_counter() - started
+    g.setdefault('upload_paths', []).append(path)
+    return path
+
+def save_upload(file):
+    """
+    Store a per-request input in the upload store and drop the reference
+    once the request is finished. Returns the blob path.
+    """
+    path = store_upload(file)
+    @after_this_request
+    def release_upload(response):
+        upload_store.release(path)
+        return response
+    return path
+
+def output_file(filename):
+    """
+    Path for a new file in OUTPUT_DIR (sharded, see utils.lifecycle)
+    """
+    return shard_path(OUTPUT_DIR, filename, create=True)
+
+def send_output(output_path, download_name):
+    """
+    send_file for one-shot outputs: the file is deleted as soon as the
+    response holds it open, rather than waiting for the janitor
+    """
+    response = send_file(output_path, as_attachment=True, download_name=download_name)
+    if not app.config['USE_X_SENDFILE']:
+        @after_this_request
+        def remove_output(response):
+            try:
+                os.remove(output_path)
+            except OSError:
+                pass  # e.g. open files can't be removed on Windows; the janitor will expire it
+            return response
+    return response
+
+def streamed_download(response, download_name, *input_paths):
+    """
+    Finish a streamed response. Inputs are released when the stream is
+    closed rather than after the view returns, since the generator still
+    reads them while the body is being sent.
+    """
+    response.headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+    @response.call_on_close
+    def release_inputs():
+        for path in input_paths:
+            upload_store.release(path)
+    return response
+
+def text_json_stream(chunks):
+    """
+    Stream {"pages": [{"page", "start", "end", "text"}, ...], "length"} where
+    start/end are character offsets of each page in the plain-text download
+    """
+    yield '{"pages": ['
+    offset = 0
+    for n, (page_num, text) in enumerate(chunks):
+        entry = {"page": page_num, "start": offset, "end": offset + len(text), "text": text}
+        yield ("," if n else "") + json.dumps(entry)
+        offset += len(text) + 1
+    yield f'], "length": {offset}}}'
+
+# pdf_to_word: parsing processes per conversion (0 = one per CPU) and the
+# seconds after which a conversion is abandoned
+WORD_WORKERS = int(os.environ.get('PDF_TO_WORD_WORKERS', 0)) or None
+WORD_TIMEOUT = int(os.environ.get('PDF_TO_WORD_TIMEOUT', 600))
+
+# /split: part-writing processes per request (0 = one per CPU)
+SPLIT_WORKERS = int(os.environ.get('SPLIT_WORKERS', 0)) or None
+
+# /compare: page-diffing processes per request (0 = one per CPU)
+COMPARE_WORKERS = int(os.environ.get('COMPARE_WORKERS', 0)) or None
+
+# /pdf-to-ppt: page-rendering processes per request (0 = one per CPU)
+PPT_WORKERS = int(os.environ.get('PDF_TO_PPT_WORKERS', 0)) or None
+
+# /jobs: each job is one process of the job pool; JOB_TASK_WORKERS processes
+# per job on top of that (1 = the job does its work in its own process), so
+# the pool's size alone bounds how many CPUs background jobs use
+JOB_TASK_WORKERS = int(os.environ.get('JOB_TASK_WORKERS', 1))
+
+# Heavy conversions that can run in the background through /jobs
+# operation: (function, number of input files, output extension, download name)
+JOB_OPERATIONS = {
+    'pdf-to-word': (partial(pdf_to_word, workers=JOB_TASK_WORKERS, timeout=WORD_TIMEOUT), 1, 'docx', 'converted.docx'),
+    'pdf-to-excel': (partial(pdf_to_excel, workers=JOB_TASK_WORKERS), 1, 'xlsx', 'converted.xlsx'),
+    'pdf-to-ppt': (partial(pdf_to_ppt, workers=JOB_TASK_WORKERS), 1, 'pptx', 'converted.pptx'),
+    'fake-scan': (partial(fake_scan, workers=JOB_TASK_WORKERS), 1, 'pdf', 'fake_scanned.pdf'),
+    'compress': (compress_pdf, 1, 'pdf', 'compressed.pdf'),
+    'compare': (partial(compare_pdfs, workers=JOB_TASK_WORKERS), 2, 'pdf', 'comparison.pdf'),
+}
+# /batch: processes per batch request (0 = one per CPU) and files accepted per request
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 0)) or None
+BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 500))
+
+# Every gunicorn worker (WEB_CONCURRENCY) has its own job pool and limits,
+# so by default the CPUs are split between them
+WEB_WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
+job_queue = JobQueue(
+    max_workers=int(os.environ.get('JOB_WORKERS', 0)) or max(1, ((os.cpu_count() or 2) - 1) // WEB_WORKERS),
+    max_queue=int(os.environ.get('JOB_MAX_QUEUE', 32)),
+    op_limits={'pdf-to-word': 2, 'fake-scan': 2, 'compare': 2},
+    state_dir=JOB_STATE_DIR,
+)
 
 @app.route("/")
 def home():
@@ -31,14 +192,65 @@ def upload_for_edit():
     if file.filename == '':
         return redirect(url_for('home'))
     
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    file.save(file_path)
+    # Session uploads outlive the request; the janitor expires them
+    filename = upload_store.persist(store_upload(file))
     return redirect(url_for('editor_view', file=filename))
 
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    return send_from_directory(UPLOAD_DIR, filename)
+    path = upload_store.touch(filename)
+    return send_from_directory(os.path.dirname(path), os.path.basename(path))
+
+@app.route('/thumbnails/<filename>/<int:page>')
+def thumbnail(filename, page):
+    input_path = upload_store.touch(filename)
+    if page < 1 or not os.path.exists(input_path):
+        abort(404)
+    scale = max(0.05, min(float(request.args.get('scale', 0.3)), 1.0))
+    try:
+        path = cached_thumbnail(thumbnail_cache, input_path, page - 1, scale)
+    except IndexError:
+        abort(404)
+    # Uploads are content-addressed, so a thumbnail URL never changes meaning
+    return send_file(path, mimetype="image/jpeg", max_age=86400)
+
+@app.route('/thumbnails/<filename>/sprite')
+def thumbnail_sprite(filename):
+    input_path = upload_store.touch(filename)
+    if not os.path.exists(input_path):
+        abort(404)
+    start = max(1, int(request.args.get('start', 1)))
+    count = max(1, min(int(request.args.get('count', 50)), 200))
+    columns = max(1, min(int(request.args.get('columns', 10)), 50))
+    scale = max(0.05, min(float(request.args.get('scale', 0.3)), 1.0))
+    path, layout = cached_sprite(thumbnail_cache, input_path, start - 1, count, scale, columns)
+    response = send_file(path, mimetype="image/jpeg", max_age=86400)
+    response.headers['X-Page-Count'] = str(layout['page_count'])
+    response.headers['X-Sprite-Start'] = str(layout['start'])
+    response.headers['X-Sprite-Pages'] = str(layout['pages'])
+    response.headers['X-Sprite-Columns'] = str(layout['columns'])
+    response.headers['X-Sprite-Cell-Width'] = str(layout['cell_width'])
+    response.headers['X-Sprite-Cell-Height'] = str(layout['cell_height'])
+    return response
+
+@app.route('/search')
+def search_text():
+    """
+    Find text in an editor session's upload through its text index.
+    Rects are in points, in the page as displayed (rotation applied).
+    """
+    input_path = upload_store.touch(request.args.get('file', ''))
+    if not os.path.isfile(input_path):
+        abort(404)
+    query = request.args.get('q', '')
+    hits = text_index.search(input_path, query)
+    pages = text_index.visible(input_path, hits) if hits else {}
+    return jsonify({
+        "query": query,
+        "count": sum(len(rects) for rects in pages.values()),
+        "pages": [{"page": pno + 1, "rects": [[round(v, 2) for v in rect] for rect in rects]}
+                  for pno, rects in sorted(pages.items())],
+    })
 
 @app.route("/esign")
 def esign_view():
@@ -52,9 +264,8 @@ def upload_for_esign():
     if 'file' not in request.files:
         return redirect(url_for('home'))
     file = request.files['file']
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    file.save(file_path)
+    # Session uploads outlive the request; the janitor expires them
+    filename = upload_store.persist(store_upload(file))
     return redirect(url_for('esign_view', file=filename))
 
 @app.route("/organize")
@@ -69,106 +280,132 @@ def upload_for_organize():
     if 'file' not in request.files:
         return redirect(url_for('home'))
     file = request.files['file']
-    filename = f"{uuid.uuid4()}_{file.filename}"
-    file_path = os.path.join(UPLOAD_DIR, filename)
-    file.save(file_path)
+    # Session uploads outlive the request; the janitor expires them
+    filename = upload_store.persist(store_upload(file))
     return redirect(url_for('organize_view', file=filename))
 
 @app.route('/pdf-to-excel', methods=['POST'])
 def pdf_to_excel_endpoint():
     file = request.files['file']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
-    output_filename = f"converted_{uuid.uuid4()}.xlsx"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    success = pdf_to_excel(input_path, output_path)
+    fmt = request.form.get('format', 'xlsx')
+    if fmt not in TABLE_FORMATS:
+        return f"Unknown output format: {fmt}", 400
+    input_path = save_upload(file)
+    output_filename = f"converted_{uuid.uuid4()}.{fmt}"
+    output_path = output_file(output_filename)
+    success = pdf_to_excel(input_path, output_path, fmt)
     if not success:
         return "No tables found in the PDF.", 400
-    return send_file(output_path, as_attachment=True, download_name="converted.xlsx")
+    return send_output(output_path, f"converted.{fmt}")
 
 @app.route('/outputs/<path:filename>')
 def serve_output(filename):
-    return send_from_directory(OUTPUT_DIR, filename)
+    path = find_path(OUTPUT_DIR, filename)
+    return send_from_directory(os.path.dirname(path), os.path.basename(path))
 
 @app.route('/merge', methods=['POST'])
 def merge():
     files = request.files.getlist('files')
     paths = []
     for file in files:
-        path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-        file.save(path)
+        path = save_upload(file)
         paths.append(path)
     output_filename = f"merged_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    merge_pdfs(paths, output_path)
-    return send_file(output_path, as_attachment=True, download_name="merged.pdf")
+    output_path = output_file(output_filename)
+    merge_pdfs(paths, output_path, titles=[os.path.basename(file.filename) for file in files])
+    return send_output(output_path, "merged.pdf")
 
 @app.route('/split', methods=['POST'])
 def split():
     file = request.files['file']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
-    split_folder = f"{OUTPUT_DIR}/{uuid.uuid4()}_split"
-    os.makedirs(split_folder, exist_ok=True)
-    split_pdf(input_path, split_folder)
-    zip_path = f"{OUTPUT_DIR}/split_{uuid.uuid4()}"
-    shutil.make_archive(zip_path, 'zip', split_folder)
-    return send_file(f"{zip_path}.zip", as_attachment=True, download_name="split_pages.zip")
+    mode = request.form.get('mode', 'pages')
+    input_path = store_upload(file)
+    try:
+        if mode == 'size':
+            value = float(request.form.get('max_size_mb') or 0) * 1024 * 1024
+        else:
+            value = request.form.get({'ranges': 'ranges', 'chunk': 'chunk_size'}.get(mode, ''))
+        parts = plan_split(input_path, mode, value)
+    except ValueError as e:
+        upload_store.release(input_path)
+        return str(e), 400
+    except Exception:
+        # The streamed response hasn't taken over the upload yet
+        upload_store.release(input_path)
+        raise
+    # Parts are already deflated, so the archive only stores them
+    entries = iter_split_parts(input_path, parts, workers=SPLIT_WORKERS)
+    response = Response(stream_with_context(stream_zip(entries, compression=zipfile.ZIP_STORED)), mimetype="application/zip")
+    return streamed_download(response, f"split_{mode}.zip", input_path)
 
 @app.route('/compress', methods=['POST'])
 def compress():
     file = request.files['file']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    preset = request.form.get('preset', 'ebook')
+    if preset not in COMPRESSION_PRESETS:
+        return f"Unknown compression preset: {preset}", 400
+    input_path = save_upload(file)
     output_filename = f"compressed_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    compress_pdf(input_path, output_path)
-    return send_file(output_path, as_attachment=True, download_name="compressed.pdf")
+    output_path = output_file(output_filename)
+    stats = compress_pdf(input_path, output_path, preset)
+    response = send_output(output_path, "compressed.pdf")
+    response.headers['X-Original-Size'] = str(stats['original_size'])
+    response.headers['X-Compressed-Size'] = str(stats['compressed_size'])
+    response.headers['X-Images-Resampled'] = str(stats['images_resampled'])
+    response.headers['Server-Timing'] = f"compress;dur={stats['seconds'] * 1000:.1f}"
+    return response
 
 @app.route('/img-to-pdf', methods=['POST'])
 def img_to_pdf():
     files = request.files.getlist('files')
     paths = []
     for file in files:
-        path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-        file.save(path)
+        path = save_upload(file)
         paths.append(path)
     output_filename = f"images_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     images_to_pdf(paths, output_path)
-    return send_file(output_path, as_attachment=True, download_name="images_converted.pdf")
+    return send_output(output_path, "images_converted.pdf")
 
 @app.route('/pdf-to-word', methods=['POST'])
 def pdf_to_docx():
     file = request.files['file']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    pages = request.form.get('pages') or None
+    try:
+        if pages:
+            parse_page_ranges(pages)
+    except ValueError:
+        return f"Invalid page range: {pages}", 400
+    input_path = save_upload(file)
     output_filename = f"converted_{uuid.uuid4()}.docx"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    pdf_to_word(input_path, output_path)
-    return send_file(output_path, as_attachment=True, download_name="converted.docx")
+    output_path = output_file(output_filename)
+    try:
+        pdf_to_word(input_path, output_path, pages, workers=WORD_WORKERS, timeout=WORD_TIMEOUT)
+    except ValueError as e:
+        return str(e), 400
+    except TimeoutError:
+        return f"Conversion took longer than {WORD_TIMEOUT} seconds; try a smaller page range or /jobs.", 504
+    return send_output(output_path, "converted.docx")
 
 @app.route('/rotate', methods=['POST'])
 def rotate():
     file = request.files['file']
     rotation = int(request.form.get('rotation', 90))
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"rotated_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     rotate_pdf(input_path, output_path, rotation)
-    return send_file(output_path, as_attachment=True, download_name="rotated.pdf")
+    return send_output(output_path, "rotated.pdf")
 
 @app.route('/watermark', methods=['POST'])
 def watermark():
     file = request.files['file']
     text = request.form['text']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"watermarked_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     add_watermark(input_path, output_path, text)
-    return send_file(output_path, as_attachment=True, download_name="watermarked.pdf")
+    return send_output(output_path, "watermarked.pdf")
 
 @app.route('/edit', methods=['POST'])
 def edit_pdf_endpoint():
@@ -183,8 +420,7 @@ def edit_pdf_endpoint():
     size = int(request.form.get('size', 20))
     page = int(request.form.get('page', 1))
     image = request.files.get('image')
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     annotations = []
     if edit_type == "text" and text_content:
         annotations.append({
@@ -197,28 +433,60 @@ def edit_pdf_endpoint():
             "color": color
         })
     elif edit_type == "image" and image:
-        img_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{image.filename}"
-        image.save(img_path)
+        img_path = save_upload(image)
         annotations.append({
             "type": "image", "page": page, "x1": x, "y1": y, "x2": x2, "y2": y2,
             "image_path": img_path
         })
     output_filename = f"edited_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     annotate_pdf(input_path, output_path, annotations)
-    return send_file(output_path, as_attachment=True, download_name="edited.pdf")
+    return send_output(output_path, "edited.pdf")
 
 @app.route('/pdf-to-jpg', methods=['POST'])
 def pdf_to_jpg_endpoint():
     file = request.files['file']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
-    img_folder = f"{OUTPUT_DIR}/{uuid.uuid4()}_images"
-    os.makedirs(img_folder, exist_ok=True)
-    pdf_to_images(input_path, img_folder)
-    zip_path = f"{OUTPUT_DIR}/images_{uuid.uuid4()}"
-    shutil.make_archive(zip_path, 'zip', img_folder)
-    return send_file(f"{zip_path}.zip", as_attachment=True, download_name="converted_images.zip")
+    dpi = int(request.form.get('dpi', 144))
+    fmt = request.form.get('format', 'jpeg').lower()
+    quality = int(request.form.get('quality', 95))
+    if fmt not in IMAGE_FORMATS:
+        return f"Unsupported image format: {fmt}", 400
+    input_path = store_upload(file)
+    stats = {}
+    try:
+        # Opens and checks the file now, so a bad upload fails before the 200 is sent
+        images = iter_page_images(input_path, dpi=max(18, min(dpi, 600)), fmt=fmt, quality=quality, stats=stats)
+    except ValueError as e:
+        upload_store.release(input_path)
+        return str(e), 400
+    # Timings are only known once the last page is out, so they go in the zip comment
+    comment = lambda: f"pages={stats['pages']} seconds={stats['seconds']:.2f} pages_per_sec={stats['pages_per_sec']:.2f}"
+    response = Response(stream_with_context(stream_zip(images, compression=zipfile.ZIP_STORED, comment=comment)), mimetype="application/zip")
+    return streamed_download(response, "converted_images.zip", input_path)
+
+@app.route('/pipeline', methods=['POST'])
+def pipeline_endpoint():
+    file = request.files['file']
+    try:
+        steps = validate_steps(json.loads(request.form.get('steps', '[]')))
+    except (ValueError, PipelineError) as e:
+        return f"Invalid pipeline: {e}", 400
+    input_path = save_upload(file)
+    output_filename = f"pipeline_{uuid.uuid4()}.pdf"
+    output_path = output_file(output_filename)
+    try:
+        timings, stats = run_pipeline(input_path, output_path, steps)
+    except (TypeError, ValueError, IndexError) as e:
+        # Values that only fail against this document, e.g. pages it doesn't have
+        if os.path.exists(output_path):
+            os.remove(output_path)
+        return f"Invalid pipeline: {e}", 400
+    response = send_output(output_path, "processed.pdf")
+    response.headers['Server-Timing'] = ", ".join(
+        f"{i+1}-{name};dur={seconds * 1000:.1f}" for i, (name, seconds) in enumerate(timings))
+    if 'images_resampled' in stats:
+        response.headers['X-Images-Resampled'] = str(stats['images_resampled'])
+    return response
 
 @app.route('/do-organize', methods=['POST'])
 def do_organize():
@@ -226,9 +494,9 @@ def do_organize():
     filename = data.get('filename')
     order = data.get('order')
     
-    input_path = os.path.join(UPLOAD_DIR, filename)
+    input_path = upload_store.touch(filename)
     output_filename = f"organized_{uuid.uuid4()}.pdf"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = output_file(output_filename)
     
     reorder_pages(input_path, output_path, order)
     
@@ -243,25 +511,28 @@ def save_annotations():
     filename = data.get('filename')
     annotations = data.get('annotations')
     
-    input_path = os.path.join(UPLOAD_DIR, filename)
+    input_path = upload_store.touch(filename)
     output_filename = f"signed_{uuid.uuid4()}.pdf"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = output_file(output_filename)
     
     # Process base64 signatures if they exist
     processed_anns = []
+    sig_paths = []
     for ann in annotations:
         if 'image_base64' in ann:
             # Convert base64 to temp file
             import base64
             img_data = base64.b64decode(ann['image_base64'].split(',')[1])
-            temp_img = os.path.join(UPLOAD_DIR, f"sig_{uuid.uuid4()}.png")
-            with open(temp_img, "wb") as f:
-                f.write(img_data)
+            temp_img = upload_store.save_bytes(img_data, ".png")
+            sig_paths.append(temp_img)
             ann['image_path'] = temp_img
             ann['type'] = 'image'
         processed_anns.append(ann)
             
-    annotate_pdf(input_path, output_path, processed_anns)
+    # Append to a copy of the upload: cost follows the changes, not the document
+    annotate_pdf(input_path, output_path, processed_anns, incremental=True)
+    for path in sig_paths:
+        upload_store.release(path)
     
     return jsonify({
         "status": "success",
@@ -272,69 +543,83 @@ def save_annotations():
 def html_to_pdf_endpoint():
     url = request.form['url']
     output_filename = f"webpage_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     success = url_to_pdf(url, output_path)
     if not success:
         return "Kaavalar Guardian Error: 'wkhtmltopdf' is missing. Please download it from https://wkhtmltopdf.org/downloads.html and add it to your System PATH to enable web-to-pdf features.", 500
-    return send_file(output_path, as_attachment=True, download_name="webpage.pdf")
+    return send_output(output_path, "webpage.pdf")
 
 @app.route('/image-to-ppt', methods=['POST'])
 def image_to_ppt_endpoint():
     files = request.files.getlist('files')
     paths = []
     for file in files:
-        path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-        file.save(path)
+        path = save_upload(file)
         paths.append(path)
     output_filename = f"presentation_{uuid.uuid4()}.pptx"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     create_ppt_with_image(paths, output_path)
-    return send_file(output_path, as_attachment=True, download_name="presentation.pptx")
+    return send_output(output_path, "presentation.pptx")
 
 @app.route('/edit-ppt', methods=['POST'])
 def edit_ppt_endpoint():
     file = request.files['file']
     text = request.form['text']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"edited_{uuid.uuid4()}.pptx"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     add_text_to_ppt(input_path, output_path, text)
-    return send_file(output_path, as_attachment=True, download_name="edited_presentation.pptx")
+    return send_output(output_path, "edited_presentation.pptx")
 
 @app.route('/extract-text', methods=['POST'])
 def extract_text_endpoint():
     file = request.files['file']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
-    text = extract_text(input_path)
-    output_filename = f"extracted_text_{uuid.uuid4()}.txt"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    with open(output_path, 'w') as f:
-        f.write(text)
-    return send_file(output_path, as_attachment=True, download_name="extracted_text.txt")
+    pages = request.form.get('pages') or None
+    backend = request.form.get('backend', 'pypdf2')
+    mode = request.form.get('format', 'text')
+    if backend not in ('pypdf2', 'fitz'):
+        return f"Unknown text backend: {backend}", 400
+    try:
+        if pages:
+            parse_page_ranges(pages)
+    except ValueError:
+        return f"Invalid page range: {pages}", 400
+    input_path = store_upload(file)
+    try:
+        # Opens and checks the file now, so a bad upload fails before the 200 is sent
+        chunks = iter_text(input_path, pages, backend)
+    except ValueError as e:
+        upload_store.release(input_path)
+        return str(e), 400
+    if mode == 'json':
+        response = Response(stream_with_context(text_json_stream(chunks)), mimetype="application/json")
+        return streamed_download(response, "extracted_text.json", input_path)
+    body = (text + "\n" for _, text in chunks)
+    response = Response(stream_with_context(body), mimetype="text/plain")
+    return streamed_download(response, "extracted_text.txt", input_path)
 
 @app.route('/add-password', methods=['POST'])
 def add_password_endpoint():
     file = request.files['file']
     password = request.form['password']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"protected_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     add_password(input_path, output_path, password)
-    return send_file(output_path, as_attachment=True, download_name="protected.pdf")
+    return send_output(output_path, "protected.pdf")
 
 @app.route('/remove-password', methods=['POST'])
 def remove_password_endpoint():
     file = request.files['file']
     password = request.form['password']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"unprotected_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    remove_password(input_path, output_path, password)
-    return send_file(output_path, as_attachment=True, download_name="unprotected.pdf")
+    output_path = output_file(output_filename)
+    try:
+        remove_password(input_path, output_path, password)
+    except ValueError as e:
+        return str(e), 400
+    return send_output(output_path, "unprotected.pdf")
 
 @app.route('/fill-form', methods=['POST'])
 def fill_form_endpoint():
@@ -342,35 +627,33 @@ def fill_form_endpoint():
     form_data = request.form.to_dict()
     # Remove 'file' key if present
     form_data.pop('file', None)
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    incremental = form_data.pop('incremental', '1') == '1'
+    input_path = save_upload(file)
     output_filename = f"filled_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    fill_form(input_path, output_path, form_data)
-    return send_file(output_path, as_attachment=True, download_name="filled_form.pdf")
+    output_path = output_file(output_filename)
+    fill_form(input_path, output_path, form_data, incremental)
+    return send_output(output_path, "filled_form.pdf")
 
 @app.route('/redact-text', methods=['POST'])
 def redact_text_endpoint():
     file = request.files['file']
     text_to_redact = request.form['text']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"redacted_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     redact_text(input_path, output_path, text_to_redact)
-    return send_file(output_path, as_attachment=True, download_name="redacted.pdf")
+    return send_output(output_path, "redacted.pdf")
 
 @app.route('/replace-text', methods=['POST'])
 def replace_text_endpoint():
     file = request.files['file']
     old_text = request.form['old_text']
     new_text = request.form['new_text']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"replaced_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     replace_text(input_path, output_path, old_text, new_text)
-    return send_file(output_path, as_attachment=True, download_name="replaced.pdf")
+    return send_output(output_path, "replaced.pdf")
 
 @app.route('/add-highlight', methods=['POST'])
 def add_highlight_endpoint():
@@ -380,12 +663,12 @@ def add_highlight_endpoint():
     # Convert hex to RGB tuple
     color = color.lstrip('#')
     color = tuple(int(color[i:i+2], 16)/255.0 for i in (0, 2, 4))
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"highlighted_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    add_highlight(input_path, output_path, text_to_highlight, color)
-    return send_file(output_path, as_attachment=True, download_name="highlighted.pdf")
+    output_path = output_file(output_filename)
+    incremental = request.form.get('incremental', '1') == '1'
+    add_highlight(input_path, output_path, text_to_highlight, color, incremental)
+    return send_output(output_path, "highlighted.pdf")
 
 @app.route('/add-text-stamp', methods=['POST'])
 def add_text_stamp_endpoint():
@@ -397,12 +680,11 @@ def add_text_stamp_endpoint():
     color = tuple(int(color_hex[i:i+2], 16)/255.0 for i in (1, 3, 5))
     page_num = request.form.get('page_num')
     page_num = int(page_num) if page_num else None
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"stamped_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     add_text_stamp(input_path, output_path, text, position, font_size, color, page_num)
-    return send_file(output_path, as_attachment=True, download_name="stamped.pdf")
+    return send_output(output_path, "stamped.pdf")
 
 @app.route('/edit-text', methods=['POST'])
 def edit_text_endpoint():
@@ -412,12 +694,11 @@ def edit_text_endpoint():
     old_text = request.form['old_text']
     new_text = request.form['new_text']
     changes = [{'page': page, 'old_text': old_text, 'new_text': new_text}]
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"edited_text_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     edit_text_in_pdf(input_path, output_path, changes)
-    return send_file(output_path, as_attachment=True, download_name="edited_text.pdf")
+    return send_output(output_path, "edited_text.pdf")
 
 @app.route('/add-page-numbers', methods=['POST'])
 def add_page_numbers_endpoint():
@@ -427,12 +708,11 @@ def add_page_numbers_endpoint():
     font_size = int(request.form.get('font_size', 12))
     color_hex = request.form.get('color', '#000000')
     color = tuple(int(color_hex[i:i+2], 16)/255.0 for i in (1, 3, 5))
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"numbered_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     add_page_numbers(input_path, output_path, start_page, position, font_size, color)
-    return send_file(output_path, as_attachment=True, download_name="numbered.pdf")
+    return send_output(output_path, "numbered.pdf")
 
 @app.route('/crop-pdf', methods=['POST'])
 def crop_pdf_endpoint():
@@ -443,66 +723,74 @@ def crop_pdf_endpoint():
     right = float(right) if right else None
     bottom = request.form.get('bottom')
     bottom = float(bottom) if bottom else None
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"cropped_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
+    output_path = output_file(output_filename)
     crop_pdf(input_path, output_path, left, top, right, bottom)
-    return send_file(output_path, as_attachment=True, download_name="cropped.pdf")
+    return send_output(output_path, "cropped.pdf")
 
 @app.route('/reorder-pages', methods=['POST'])
 def reorder_pages_endpoint():
     file = request.files['file']
     page_order_str = request.form['page_order']
     page_order = [int(x.strip()) for x in page_order_str.split(',') if x.strip()]
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"reordered_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    reorder_pages(input_path, output_path, page_order)
-    return send_file(output_path, as_attachment=True, download_name="reordered.pdf")
+    output_path = output_file(output_filename)
+    try:
+        reorder_pages(input_path, output_path, page_order)
+    except ValueError as e:
+        return str(e), 400
+    return send_output(output_path, "reordered.pdf")
 
 @app.route('/pdf-to-ppt', methods=['POST'])
 def pdf_to_ppt_endpoint():
     file = request.files['file']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
+    slide_size = request.form.get('slide_size', 'auto')
     output_filename = f"converted_{uuid.uuid4()}.pptx"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    pdf_to_ppt(input_path, output_path)
-    return send_file(output_path, as_attachment=True, download_name="converted.pptx")
+    output_path = output_file(output_filename)
+    try:
+        pdf_to_ppt(input_path, output_path, slide_size, workers=PPT_WORKERS)
+    except ValueError as e:
+        return str(e), 400
+    return send_output(output_path, "converted.pptx")
 
 @app.route('/extract-pages', methods=['POST'])
 def extract_pages_endpoint():
     file = request.files['file']
     pages = request.form['pages']
-    input_path = f"{UPLOAD_DIR}/{uuid.uuid4()}_{file.filename}"
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"extracted_{uuid.uuid4()}.pdf"
-    output_path = f"{OUTPUT_DIR}/{output_filename}"
-    extract_pages(input_path, output_path, pages)
-    return send_file(output_path, as_attachment=True, download_name="extracted.pdf")
+    output_path = output_file(output_filename)
+    try:
+        extract_pages(input_path, output_path, pages)
+    except ValueError as e:
+        return str(e), 400
+    return send_output(output_path, "extracted.pdf")
 
 @app.route('/compare', methods=['POST'])
 def compare_endpoint():
     file1 = request.files['file1']
     file2 = request.files['file2']
-    path1 = os.path.join(UPLOAD_DIR, f"v1_{uuid.uuid4()}_{file1.filename}")
-    path2 = os.path.join(UPLOAD_DIR, f"v2_{uuid.uuid4()}_{file2.filename}")
-    file1.save(path1)
-    file2.save(path2)
+    path1 = save_upload(file1)
+    path2 = save_upload(file2)
+    
+    mode = request.form.get('mode', 'text')
     
     output_filename = f"comparison_{uuid.uuid4()}.pdf"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = output_file(output_filename)
     
-    compare_pdfs(path1, path2, output_path)
-    return send_file(output_path, as_attachment=True, download_name="comparison.pdf")
+    try:
+        compare_pdfs(path1, path2, output_path, mode, workers=COMPARE_WORKERS)
+    except ValueError as e:
+        return str(e), 400
+    return send_output(output_path, "comparison.pdf")
 
 @app.route('/smart-redact', methods=['POST'])
 def smart_redact_endpoint():
     file = request.files['file']
-    input_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{file.filename}")
-    file.save(input_path)
+    input_path = save_upload(file)
     
     # patterns can be form field or JSON
     patterns = request.form.getlist('patterns')
@@ -510,40 +798,114 @@ def smart_redact_endpoint():
         patterns = ['email', 'credit_card'] # Defaults
         
     output_filename = f"redacted_{uuid.uuid4()}.pdf"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = output_file(output_filename)
     
-    smart_redact(input_path, output_path, patterns)
-    return send_file(output_path, as_attachment=True, download_name="smart_redacted.pdf")
+    try:
+        redacted = smart_redact(input_path, output_path, patterns)
+    except re.error as e:
+        return f"Invalid pattern: {e}", 400
+    response = send_output(output_path, "smart_redacted.pdf")
+    response.headers['X-Redactions'] = str(redacted)
+    return response
 
 @app.route('/fake-scan', methods=['POST'])
 def fake_scan_endpoint():
     file = request.files['file']
-    input_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{file.filename}")
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"scanned_{uuid.uuid4()}.pdf"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = output_file(output_filename)
     fake_scan(input_path, output_path)
-    return send_file(output_path, as_attachment=True, download_name="fake_scanned.pdf")
+    return send_output(output_path, "fake_scanned.pdf")
 
 @app.route('/make-booklet', methods=['POST'])
 def make_booklet_endpoint():
     file = request.files['file']
-    input_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{file.filename}")
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"booklet_{uuid.uuid4()}.pdf"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = output_file(output_filename)
     make_booklet(input_path, output_path)
-    return send_file(output_path, as_attachment=True, download_name="booklet.pdf")
+    return send_output(output_path, "booklet.pdf")
 
 @app.route('/remove-annotations', methods=['POST'])
 def remove_annotations_endpoint():
     file = request.files['file']
-    input_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}_{file.filename}")
-    file.save(input_path)
+    input_path = save_upload(file)
     output_filename = f"cleaned_{uuid.uuid4()}.pdf"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
-    remove_annotations(input_path, output_path)
-    return send_file(output_path, as_attachment=True, download_name="cleaned.pdf")
+    output_path = output_file(output_filename)
+    # Full rewrite by default, so the removed annotations are really gone
+    incremental = request.form.get('incremental', '0') == '1'
+    remove_annotations(input_path, output_path, incremental)
+    return send_output(output_path, "cleaned.pdf")
+
+# --- BATCH ROUTES ---
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    operation = request.form.get('operation')
+    if operation not in BATCH_OPERATIONS:
+        return f"Unknown batch operation: {operation}", 400
+    files = [file for file in request.files.getlist('files') if file.filename]
+    if not files:
+        return "No files uploaded", 400
+    if len(files) > BATCH_MAX_FILES:
+        return f"At most {BATCH_MAX_FILES} files per batch", 400
+    try:
+        func, kwargs = prepare_batch(operation, request.form)
+    except ValueError as e:
+        return str(e), 400
+    paths = [store_upload(file) for file in files]
+    inputs = list(zip(paths, [file.filename for file in files]))
+    entries = run_batch(operation, func, kwargs, inputs, OUTPUT_DIR, workers=BATCH_WORKERS)
+    response = Response(stream_with_context(stream_zip(entries)), mimetype="application/zip")
+    return streamed_download(response, f"batch_{operation}.zip", *paths)
+
+# --- BACKGROUND JOB ROUTES ---
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    operation = request.form.get('operation')
+    if operation not in JOB_OPERATIONS:
+        return jsonify({"status": "error", "message": f"Unknown operation: {operation}"}), 400
+    func, num_inputs, ext, download_name = JOB_OPERATIONS[operation]
+    files = request.files.getlist('files') or [request.files[k] for k in ('file', 'file1', 'file2') if k in request.files]
+    if len(files) != num_inputs:
+        return jsonify({"status": "error", "message": f"{operation} expects {num_inputs} file(s)"}), 400
+    paths = [store_upload(file) for file in files]
+    def release_inputs(job):
+        for path in paths:
+            upload_store.release(path)
+    output_path = output_file(f"job_{uuid.uuid4()}.{ext}")
+    try:
+        job_id = job_queue.submit(operation, func, (*paths, output_path), output_path, download_name, on_finish=release_inputs)
+    except QueueFull as e:
+        release_inputs(None)
+        return jsonify({"status": "error", "message": str(e)}), 429, {"Retry-After": "30"}
+    return jsonify({
+        "status": "queued",
+        "jobId": job_id,
+        "statusUrl": url_for('job_status', job_id=job_id),
+        "resultUrl": url_for('job_result', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    info = job_queue.status(job_id)
+    if info is None:
+        abort(404)
+    return jsonify(info)
+
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = job_queue.get(job_id)
+    if job is None:
+        abort(404)
+    if job["status"] == "failed":
+        return jsonify({"status": "failed", "message": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"status": job["status"]}), 202
+    if not os.path.exists(job["output_path"]):
+        return jsonify({"status": "expired"}), 410
+    return send_file(job["output_path"], as_attachment=True, download_name=job["download_name"])
 
 # --- PPT EDITOR ROUTES ---
 
@@ -592,6 +954,7 @@ def ppt_generate():
         prs.part.drop_rel(rId)
         del prs.slides._sle[i]
 
+    slide_images = []
     for slide_info in slides_data:
         layout_idx = slide_info.get('layout_index', 0)
         content = slide_info.get('content', {})
@@ -605,21 +968,75 @@ def ppt_generate():
             if isinstance(val, str) and val.startswith("data:image"):
                 import base64
                 img_data = base64.b64decode(val.split(',')[1])
-                img_path = os.path.join(UPLOAD_DIR, f"ppt_img_{uuid.uuid4()}.png")
-                with open(img_path, "wb") as f:
-                    f.write(img_data)
+                img_path = upload_store.save_bytes(img_data, ".png")
+                slide_images.append(img_path)
                 content[key] = img_path
                 
         add_slide_to_presentation(prs, layout_idx, content)
         
     output_filename = f"presentation_{uuid.uuid4()}.pptx"
-    output_path = os.path.join(OUTPUT_DIR, output_filename)
+    output_path = output_file(output_filename)
     prs.save(output_path)
+    for path in slide_images:
+        upload_store.release(path)
     
     return jsonify({
         "status": "success",
         "downloadUrl": url_for('serve_output', filename=output_filename)
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(registry.render(), content_type=METRICS_CONTENT_TYPE)
+
+def instrumented(endpoint, view):
+    """
+    Record upload, processing, output size and page metrics for a view.
+    Streamed bodies are counted as they are sent, and processing time runs
+    until the stream is closed.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        except BaseException:
+            IN_FLIGHT.dec()
+            raise
+        returned = time.perf_counter()
+        upload_seconds = g.get('upload_seconds', 0.0)
+        pages = sum(count_pages(path) for path in g.get('upload_paths', ()))
+        def observe(finished, output_bytes):
+            IN_FLIGHT.dec()
+            seconds = finished - started - upload_seconds
+            if upload_seconds:
+                UPLOAD_SECONDS.observe(upload_seconds, endpoint=endpoint)
+            PROCESSING_SECONDS.observe(seconds, endpoint=endpoint)
+            if output_bytes is not None:
+                OUTPUT_BYTES.observe(output_bytes, endpoint=endpoint)
+            if pages and response.status_code == 200:
+                INPUT_PAGES.observe(pages, endpoint=endpoint)
+                PAGES_PER_SECOND.observe(pages / max(seconds, 1e-6), endpoint=endpoint)
+        if response.content_length is None and response.is_streamed:
+            sent = {'bytes': 0}
+            body = response.response
+            def counted():
+                for chunk in body:
+                    sent['bytes'] += len(chunk.encode() if isinstance(chunk, str) else chunk)
+                    yield chunk
+            response.response = counted()
+            response.call_on_close(lambda: observe(time.perf_counter(), sent['bytes']))
+        else:
+            # send_file responses are passed straight to the server, which
+            # never calls their close callbacks
+            observe(returned, response.content_length)
+        return response
+    return wrapper
+
+for _endpoint, _view in list(app.view_functions.items()):
+    if _endpoint not in ('static', 'metrics_endpoint'):
+        app.view_functions[_endpoint] = instrumented(_endpoint, _view)
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,256 @@
+"""
+Benchmark every utils.pdf_tools and utils.ppt_tools function on synthetic inputs.
+
+    python benchmarks/bench.py --sizes 1,10,100 --out results.json
+    python benchmarks/bench.py --sizes 1,10,100 --baseline baseline.json --threshold 0.2
+    python benchmarks/bench.py --only merge_pdfs,extract_text --sizes 1000,5000
+    python benchmarks/bench.py --backends fitz,pypdf2 --sizes 10,100,1000
+
+Each case is timed --repeat times (median wall time) and its peak Python heap
+is recorded with tracemalloc. tracemalloc only sees allocations made through
+Python, not MuPDF's own buffers or worker processes, so treat peak_bytes as a
+relative signal. With --baseline, any case slower than baseline by more than
+--threshold is reported and the exit status is 1.
+
+With --backends, every function that takes a backend= argument (see
+utils.backends) is run once per backend and a side-by-side table of their
+throughput is printed at the end.
+"""
+import os, sys, json, time, shutil, argparse, inspect, platform, statistics, tempfile, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pptx import Presentation
+from utils import pdf_tools, ppt_tools
+import inputs
+
+def _out(ctx, ext):
+    ctx["n"] += 1
+    return os.path.join(ctx["outdir"], f"out_{ctx['n']}.{ext}")
+
+def _folder(ctx):
+    path = _out(ctx, "d")
+    os.makedirs(path)
+    return path
+
+def _text(ctx):
+    return inputs.text_pdf(ctx["workdir"], ctx["pages"])
+
+def _image(ctx):
+    return inputs.image_pdf(ctx["workdir"], ctx["pages"])
+
+def _form(ctx):
+    return inputs.form_pdf(ctx["workdir"], ctx["pages"])
+
+def _protected(ctx):
+    path = _out(ctx, "pdf")
+    # RC4 from the pypdf2 backend, so remove_password can be compared on both
+    pdf_tools.add_password(_text(ctx), path, "secret", backend="pypdf2")
+    return path
+
+def _annotated(ctx):
+    path = _out(ctx, "pdf")
+    pdf_tools.add_highlight(_text(ctx), path, "invoice")
+    return path
+
+def _annotations(ctx):
+    sig = inputs.signature_png(ctx["workdir"])
+    anns = []
+    for p in range(1, ctx["pages"] + 1):
+        anns.append({"type": "text", "page": p, "x": 72, "y": 72, "content": "Approved", "color": "#ff0000"})
+        anns.append({"type": "image", "page": p, "x1": 300, "y1": 650, "x2": 450, "y2": 700, "image_path": sig})
+    return anns
+
+def _add_slides(prs, count):
+    for s in range(count):
+        ppt_tools.add_slide_to_presentation(prs, 1, {"0": f"Slide {s+1}", "1": " ".join(inputs.WORDS), "notes": "Speaker notes"})
+
+# name -> (setup returning the call's arguments, default page cap or None)
+# Caps keep the default run practical for functions that take seconds per page;
+# pass --no-caps to run everything at every size.
+CASES = {
+    "merge_pdfs": (lambda c: ([_text(c), _image(c)], _out(c, "pdf")), None),
+    "split_pdf": (lambda c: (_text(c), _folder(c)), None),
+    "pdf_to_excel": (lambda c: (_text(c), _out(c, "xlsx")), 200),
+    "compress_pdf": (lambda c: (_image(c), _out(c, "pdf")), None),
+    "images_to_pdf": (lambda c: (inputs.image_set(c["workdir"], c["pages"]), _out(c, "pdf")), 500),
+    "pdf_to_word": (lambda c: (_text(c), _out(c, "docx")), 50),
+    "rotate_pdf": (lambda c: (_text(c), _out(c, "pdf"), 90), None),
+    "add_watermark": (lambda c: (_text(c), _out(c, "pdf"), "CONFIDENTIAL"), None),
+    "annotate_pdf": (lambda c: (_text(c), _out(c, "pdf"), _annotations(c)), None),
+    "pdf_to_images": (lambda c: (_text(c), _folder(c)), 1000),
+    "extract_text": (lambda c: (_text(c),), None),
+    "add_password": (lambda c: (_text(c), _out(c, "pdf"), "secret"), None),
+    "remove_password": (lambda c: (_protected(c), _out(c, "pdf"), "secret"), None),
+    "fill_form": (lambda c: (_form(c), _out(c, "pdf"), {f"field_{p}_0": "value" for p in range(c["pages"])}), None),
+    "redact_text": (lambda c: (_text(c), _out(c, "pdf"), "invoice"), None),
+    "replace_text": (lambda c: (_text(c), _out(c, "pdf"), "invoice", "receipt"), None),
+    "add_highlight": (lambda c: (_text(c), _out(c, "pdf"), "invoice"), None),
+    "add_text_stamp": (lambda c: (_text(c), _out(c, "pdf"), "APPROVED"), None),
+    "edit_text_in_pdf": (lambda c: (_text(c), _out(c, "pdf"), [{"page": 1, "old_text": "invoice", "new_text": "receipt"}]), None),
+    "add_page_numbers": (lambda c: (_text(c), _out(c, "pdf")), None),
+    "crop_pdf": (lambda c: (_text(c), _out(c, "pdf"), 36, 36, 576, 756), None),
+    "reorder_pages": (lambda c: (_text(c), _out(c, "pdf"), list(range(c["pages"], 0, -1))), None),
+    "pdf_to_ppt": (lambda c: (_text(c), _out(c, "pptx")), 200),
+    "extract_pages": (lambda c: (_text(c), _out(c, "pdf"), f"1-{max(1, c['pages'] // 2)}"), None),
+    "compare_pdfs": (lambda c: (_text(c), _annotated(c), _out(c, "pdf")), None),
+    "smart_redact": (lambda c: (_text(c), _out(c, "pdf"), ["email", "phone", "credit_card"]), None),
+    "fake_scan": (lambda c: (_text(c), _out(c, "pdf")), 200),
+    "make_booklet": (lambda c: (_text(c), _out(c, "pdf")), None),
+    "remove_annotations": (lambda c: (_annotated(c), _out(c, "pdf")), None),
+    "get_layouts": (lambda c: (inputs.template_pptx(),), 1),
+    "create_ppt_with_image": (lambda c: (inputs.image_set(c["workdir"], c["pages"]), _out(c, "pptx")), 500),
+    "add_text_to_ppt": (lambda c: (inputs.deck(c["workdir"], c["pages"]), _out(c, "pptx"), "Added"), 1000),
+    "add_slide_to_presentation": (lambda c: (Presentation(inputs.template_pptx()), c["pages"]), 1000),
+}
+
+def _function(name):
+    if name == "add_slide_to_presentation":
+        # Operates on an open Presentation, so time a batch of calls
+        return _add_slides
+    return getattr(pdf_tools, name, None) or getattr(ppt_tools, name)
+
+def takes_backend(name):
+    try:
+        return "backend" in inspect.signature(_function(name)).parameters
+    except (TypeError, ValueError):
+        return False
+
+def run_case(name, pages, workdir, repeat, backend=None):
+    setup, _ = CASES[name]
+    func = _function(name)
+    kwargs = {"backend": backend} if backend else {}
+    times = []
+    peak = 0
+    for _ in range(repeat):
+        outdir = tempfile.mkdtemp(dir=workdir, prefix="run_")
+        ctx = {"workdir": workdir, "outdir": outdir, "pages": pages, "n": 0}
+        try:
+            args = setup(ctx)
+            tracemalloc.start()
+            started = time.perf_counter()
+            func(*args, **kwargs)
+            times.append(time.perf_counter() - started)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        finally:
+            tracemalloc.stop()
+            shutil.rmtree(outdir, ignore_errors=True)
+    seconds = statistics.median(times)
+    return {
+        "name": name,
+        "pages": pages,
+        "backend": backend,
+        "seconds": seconds,
+        "runs": times,
+        "pages_per_sec": pages / seconds if seconds > 0 else None,
+        "peak_bytes": peak,
+    }
+
+def compare(results, baseline, threshold, min_delta=0.01):
+    """
+    Returns the cases whose median time grew by more than threshold (0.2 = 20%)
+    and by at least min_delta seconds, so timer noise on tiny cases is ignored
+    """
+    previous = {(r["name"], r["pages"], r.get("backend")): r for r in baseline["results"] if "seconds" in r}
+    regressions = []
+    for r in results:
+        base = previous.get((r["name"], r["pages"], r.get("backend")))
+        if base is None:
+            continue
+        if r["seconds"] > base["seconds"] * (1 + threshold) and r["seconds"] - base["seconds"] >= min_delta:
+            regressions.append((r, base))
+    return regressions
+
+def backend_table(results, backends):
+    """
+    Lines comparing pages/sec per backend for every (function, size) run
+    with more than one backend; the last column is first backend / last
+    """
+    by_case = {}
+    for r in results:
+        if r.get("backend") and "seconds" in r:
+            by_case.setdefault((r["name"], r["pages"]), {})[r["backend"]] = r
+    lines = [f"{'function':28} {'pages':>6}" + "".join(f" {b + ' p/s':>14}" for b in backends) + f" {'speedup':>9}"]
+    for (name, pages), runs in by_case.items():
+        if len(runs) < 2:
+            continue
+        cells = "".join(f" {runs[b]['pages_per_sec']:14.1f}" if b in runs else f" {'-':>14}" for b in backends)
+        first, last = runs.get(backends[0]), runs.get(backends[-1])
+        speedup = f" {last['seconds'] / first['seconds']:8.1f}x" if first and last and first["seconds"] else ""
+        lines.append(f"{name:28} {pages:6}{cells}{speedup}")
+    return lines
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark utils.pdf_tools and utils.ppt_tools")
+    parser.add_argument("--sizes", default="1,10,100", help="comma-separated page/slide/image counts (up to 5000)")
+    parser.add_argument("--only", help="comma-separated function names")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "pdf_tools_bench"),
+                        help="where generated inputs are cached between runs")
+    parser.add_argument("--no-caps", action="store_true", help="run slow functions at every size")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    parser.add_argument("--min-delta", type=float, default=0.01, help="ignore slowdowns smaller than this many seconds")
+    parser.add_argument("--backends", help="comma-separated PDF backends (fitz,pypdf2) to compare where a function has several")
+    args = parser.parse_args(argv)
+
+    sizes = [int(s) for s in args.sizes.split(",")]
+    names = args.only.split(",") if args.only else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"unknown functions: {', '.join(unknown)}")
+    backends = args.backends.split(",") if args.backends else []
+    os.makedirs(args.workdir, exist_ok=True)
+
+    results = []
+    for name in names:
+        cap = CASES[name][1]
+        for pages in sizes:
+            if cap and pages > cap and not args.no_caps:
+                continue
+            for backend in (backends if backends and takes_backend(name) else [None]):
+                label = f"{name}[{backend}]" if backend else name
+                try:
+                    result = run_case(name, pages, args.workdir, args.repeat, backend)
+                except Exception as e:
+                    result = {"name": name, "pages": pages, "backend": backend, "error": f"{e.__class__.__name__}: {e}"}
+                    print(f"{label:28} {pages:6}  ERROR {result['error']}")
+                else:
+                    print(f"{label:28} {pages:6}  {result['seconds']:9.3f}s  {result['peak_bytes'] / 1e6:9.1f} MB")
+                results.append(result)
+
+    if len(backends) > 1:
+        print()
+        for line in backend_table(results, backends):
+            print(line)
+        print()
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "backends": backends,
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare([r for r in results if "seconds" in r], baseline, args.threshold, args.min_delta)
+        for r, base in regressions:
+            print(f"REGRESSION {r['name']} @ {r['pages']}: {base['seconds']:.3f}s -> {r['seconds']:.3f}s")
+        if regressions:
+            return 1
+        print(f"No regressions above {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+Synthetic, reproducible inputs for the benchmark suite.
+Every generator is seeded and cached by (kind, size) inside the work folder.
+"""
+from PIL import Image
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter
+from pptx import Presentation
+import os, io, random
+import numpy as np
+import fitz  # PyMuPDF
+
+WORDS = ("invoice total amount customer contract payment schedule delivery order account "
+         "balance statement period service agreement party terms notice date reference").split()
+
+def _cached(workdir, name, build):
+    path = os.path.join(workdir, name)
+    if not os.path.exists(path):
+        tmp_path = path + ".tmp"
+        build(tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+def text_pdf(workdir, pages):
+    """
+    Dense text pages, with a contact line and a small table on every page
+    so redaction, search and table extraction all have something to find
+    """
+    def build(path):
+        rng = random.Random(pages)
+        can = canvas.Canvas(path, pagesize=letter)
+        for p in range(pages):
+            can.setFont("Helvetica", 9)
+            y = 750
+            can.drawString(50, y, f"Page {p+1} contact billing{p}@example.com phone (555) 123-{p % 10000:04d}")
+            for _ in range(55):
+                y -= 12
+                can.drawString(50, y, " ".join(rng.choice(WORDS) for _ in range(14)))
+            # 4x3 ruled table
+            top = 90
+            for r in range(5):
+                can.line(50, top - r * 15 + 60, 350, top - r * 15 + 60)
+            for c in range(4):
+                can.line(50 + c * 100, top + 60, 50 + c * 100, top)
+            for r in range(4):
+                for c in range(3):
+                    can.drawString(55 + c * 100, top + 48 - r * 15, f"r{r}c{c}" if r else f"Col{c}")
+            can.showPage()
+        can.save()
+    return _cached(workdir, f"text_{pages}.pdf", build)
+
+def _noise_jpeg(rng, width, height, quality=85):
+    gradient = np.linspace(60, 200, width, dtype=np.float32)[None, :, None]
+    pixels = gradient + rng.normal(0, 25, (height, width, 3))
+    buf = io.BytesIO()
+    Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8)).save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+def image_pdf(workdir, pages):
+    """
+    Scanned-style pages: one ~200 DPI photo per page plus a caption
+    """
+    def build(path):
+        rng = np.random.default_rng(pages)
+        # A handful of distinct images keeps generation fast at 5,000 pages
+        images = [_noise_jpeg(rng, 1100, 1400) for _ in range(min(pages, 8))]
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            page.insert_image(page.rect + (36, 36, -36, -72), stream=images[p % len(images)])
+            page.insert_text((36, page.rect.height - 40), f"Scanned page {p+1}", fontsize=10)
+        doc.save(path)
+        doc.close()
+    return _cached(workdir, f"image_{pages}.pdf", build)
+
+def form_pdf(workdir, pages):
+    """
+    AcroForm pages with five text fields each, named field_<page>_<n>
+    """
+    def build(path):
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page()
+            for n in range(5):
+                widget = fitz.Widget()
+                widget.field_name = f"field_{p}_{n}"
+                widget.field_type = fitz.PDF_WIDGET_TYPE_TEXT
+                widget.rect = fitz.Rect(72, 100 + n * 40, 372, 125 + n * 40)
+                page.insert_text((72, 95 + n * 40), f"Field {n+1}", fontsize=9)
+                page.add_widget(widget)
+        doc.save(path)
+        doc.close()
+    return _cached(workdir, f"form_{pages}.pdf", build)
+
+def image_set(workdir, count):
+    folder = os.path.join(workdir, f"images_{count}")
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(count)
+    def build(path):
+        with open(path, "wb") as f:
+            f.write(_noise_jpeg(rng, 1024, 768))
+    return [_cached(folder, f"img_{i}.jpg", build) for i in range(count)]
+
+def deck(workdir, slides):
+    def build(path):
+        prs = Presentation()
+        for s in range(slides):
+            slide = prs.slides.add_slide(prs.slide_layouts[1])
+            slide.shapes.title.text = f"Slide {s+1}"
+            slide.placeholders[1].text = " ".join(WORDS)
+        with open(path, "wb") as f:
+            prs.save(f)
+    return _cached(workdir, f"deck_{slides}.pptx", build)
+
+def signature_png(workdir):
+    def build(path):
+        img = Image.new("RGBA", (300, 100), (255, 255, 255, 0))
+        img.paste((20, 20, 120, 255), (20, 45, 280, 55))
+        img.save(path, "PNG")
+    return _cached(workdir, "signature.png", build)
+
+def template_pptx():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(root, "static", "assets", "templates", "corporate.pptx")
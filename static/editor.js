@@ -28,6 +28,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let isDragging = false;
     let startX, startY;
     const pageCache = new Map();
+    let searchHits = new Map(); // page -> [[x0, y0, x1, y1], ...] in PDF points
+    let lastQuery = '';
 
     // DOM Elements
     const pdfCanvas = document.getElementById('pdf-canvas');
@@ -122,6 +124,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
     function drawAnnotations() {
         annotCtx.clearRect(0, 0, annotCanvas.width, annotCanvas.height);
+        annotCtx.fillStyle = 'rgba(250, 204, 21, 0.35)';
+        (searchHits.get(pageNum) || []).forEach(([x0, y0, x1, y1]) => {
+            annotCtx.fillRect(x0 * scale, y0 * scale, (x1 - x0) * scale, (y1 - y0) * scale);
+        });
         annotations.filter(a => a.page === pageNum).forEach((ann, idx) => {
             const isSelected = selectedId === idx;
             
@@ -408,6 +414,39 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    // Search, answered from the server-side text index
+    const searchInput = document.getElementById('search-input');
+    searchInput.addEventListener('keydown', async e => {
+        if (e.key !== 'Enter') return;
+        const query = searchInput.value.trim();
+        const repeat = query === lastQuery;
+        lastQuery = query;
+        if (!query) {
+            searchHits = new Map();
+            drawAnnotations();
+            return;
+        }
+        try {
+            if (!repeat) {
+                const response = await fetch(`/search?file=${encodeURIComponent(window.PDF_FILENAME)}&q=${encodeURIComponent(query)}`);
+                const result = await response.json();
+                searchHits = new Map(result.pages.map(p => [p.page, p.rects]));
+                showToast(`${result.count} match${result.count === 1 ? '' : 'es'}`, result.count ? 'success' : 'info');
+            }
+            // A new search starts on the current page, Enter again moves on
+            const pages = [...searchHits.keys()];
+            const next = pages.find(p => repeat ? p > pageNum : p >= pageNum) || pages[0];
+            if (next && next !== pageNum) {
+                renderPage(next);
+            } else {
+                drawAnnotations();
+            }
+        } catch (err) {
+            console.error(err);
+            showToast('Search failed', 'error');
+        }
+    });
+
     // Navigation
     document.getElementById('prev-page').onclick = () => {
         if (pageNum <= 1) return;
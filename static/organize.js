@@ -1,47 +1,61 @@
 document.addEventListener('DOMContentLoaded', () => {
-    const pdfjsLib = window['pdfjs-dist/build/pdf'];
-    pdfjsLib.GlobalWorkerOptions.workerSrc = 'https://cdnjs.cloudflare.com/ajax/libs/pdf.js/3.11.174/pdf.worker.min.js';
-
     const grid = document.getElementById('organize-grid');
     const loader = document.getElementById('editor-loader');
     const saveBtn = document.getElementById('save-organize');
-    let pdfDoc = null;
+    const SCALE = 0.3;
+    const BATCH = 50;
+    const COLUMNS = 10;
 
-    async function init() {
-        const url = `/uploads/${window.PDF_FILENAME}`;
-        pdfDoc = await pdfjsLib.getDocument(url).promise;
-        
-        for (let i = 1; i <= pdfDoc.numPages; i++) {
-            const page = await pdfDoc.getPage(i);
-            const viewport = page.getViewport({ scale: 0.3 });
-            
-            const card = document.createElement('div');
-            card.className = 'page-card';
-            card.dataset.pageNum = i;
-            
-            const canvas = document.createElement('canvas');
-            canvas.height = viewport.height;
-            canvas.width = viewport.width;
-            await page.render({ canvasContext: canvas.getContext('2d'), viewport }).promise;
-            
-            const label = document.createElement('div');
-            label.className = 'page-label';
-            label.textContent = i;
+    function addCard(pageNum, spriteUrl, col, row, cellWidth, cellHeight) {
+        const card = document.createElement('div');
+        card.className = 'page-card';
+        card.dataset.pageNum = pageNum;
+
+        // One sprite sheet per batch, each card shows its own cell of it
+        const thumb = document.createElement('div');
+        thumb.className = 'page-thumb';
+        thumb.style.width = `${cellWidth}px`;
+        thumb.style.height = `${cellHeight}px`;
+        thumb.style.backgroundImage = `url(${spriteUrl})`;
+        thumb.style.backgroundPosition = `-${col * cellWidth}px -${row * cellHeight}px`;
+
+        const label = document.createElement('div');
+        label.className = 'page-label';
+        label.textContent = pageNum;
+
+        const deleteBtn = document.createElement('button');
+        deleteBtn.className = 'page-delete';
+        deleteBtn.innerHTML = '<i data-lucide="trash-2"></i>';
+        deleteBtn.onclick = (e) => {
+            e.stopPropagation();
+            card.remove();
+        };
+
+        card.appendChild(thumb);
+        card.appendChild(label);
+        card.appendChild(deleteBtn);
+        grid.appendChild(card);
+    }
 
-            const deleteBtn = document.createElement('button');
-            deleteBtn.className = 'page-delete';
-            deleteBtn.innerHTML = '<i data-lucide="trash-2"></i>';
-            deleteBtn.onclick = (e) => {
-                e.stopPropagation();
-                card.remove();
-            };
+    async function loadBatch(start) {
+        const file = encodeURIComponent(window.PDF_FILENAME);
+        const url = `/thumbnails/${file}/sprite?start=${start}&count=${BATCH}&columns=${COLUMNS}&scale=${SCALE}`;
+        const resp = await fetch(url);
+        const spriteUrl = URL.createObjectURL(await resp.blob());
+        const pageCount = parseInt(resp.headers.get('X-Page-Count'));
+        const pages = parseInt(resp.headers.get('X-Sprite-Pages'));
+        const columns = parseInt(resp.headers.get('X-Sprite-Columns'));
+        const cellWidth = parseInt(resp.headers.get('X-Sprite-Cell-Width'));
+        const cellHeight = parseInt(resp.headers.get('X-Sprite-Cell-Height'));
 
-            card.appendChild(canvas);
-            card.appendChild(label);
-            card.appendChild(deleteBtn);
-            grid.appendChild(card);
+        for (let n = 0; n < pages; n++) {
+            addCard(start + n, spriteUrl, n % columns, Math.floor(n / columns), cellWidth, cellHeight);
         }
-        
+        return pageCount;
+    }
+
+    async function init() {
+        let pageCount = await loadBatch(1);
         lucide.createIcons();
         loader.style.display = 'none';
 
@@ -50,6 +64,11 @@ document.addEventListener('DOMContentLoaded', () => {
             animation: 150,
             ghostClass: 'sortable-ghost'
         });
+
+        for (let start = 1 + BATCH; start <= pageCount; start += BATCH) {
+            await loadBatch(start);
+            lucide.createIcons();
+        }
     }
 
     saveBtn.onclick = async () => {
@@ -0,0 +1,36 @@
+"""
+Which library runs the page-level operations that exist twice: a PyMuPDF
+("fitz") fast path and the original pure-Python PyPDF2 implementation,
+kept as a fallback for files MuPDF handles differently.
+
+fitz is the default. PDF_BACKEND changes the default for every operation
+and PDF_BACKENDS overrides it per operation, e.g.
+PDF_BACKENDS="booklet=pypdf2,split=pypdf2". A backend= argument on the
+utils.pdf_tools function wins over both.
+"""
+import os
+
+BACKENDS = ('fitz', 'pypdf2')
+OPERATIONS = ('split', 'rotate', 'reorder', 'extract_pages', 'booklet',
+              'add_password', 'remove_password', 'merge', 'compress')
+
+def parse_overrides(value):
+    """
+    "op=backend,op=backend" -> {op: backend}
+    """
+    overrides = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        operation, _, backend = item.partition("=")
+        overrides[operation.strip()] = backend.strip()
+    return overrides
+
+DEFAULT = os.environ.get('PDF_BACKEND', 'fitz')
+OVERRIDES = parse_overrides(os.environ.get('PDF_BACKENDS'))
+
+def choose(operation, backend=None):
+    backend = backend or OVERRIDES.get(operation) or DEFAULT
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend for {operation}: {backend}")
+    return backend
@@ -0,0 +1,116 @@
+"""
+Apply one utils.pdf_tools operation, with one set of parameters, to many files.
+
+Parameters are parsed once per batch in prepare(), and what only depends on
+them is built once per worker process rather than once per file (the
+watermark overlay is cached by utils.watermark). The files are processed on
+a bounded process pool and come back as zip entries in upload order,
+followed by a manifest.json with the outcome for every file.
+"""
+import os, json, time, uuid
+from utils.parallel import default_workers, run_chunks
+from utils.lifecycle import shard_path
+from utils.pdf_tools import add_watermark, add_page_numbers, add_password
+
+# operation: prefix for the output names
+OPERATIONS = {
+    'watermark': 'watermarked',
+    'add-page-numbers': 'numbered',
+    'add-password': 'protected',
+}
+
+def parse_color(color_hex):
+    color_hex = color_hex.lstrip('#')
+    if len(color_hex) != 6:
+        raise ValueError(f"Invalid color: #{color_hex}")
+    return tuple(int(color_hex[i:i+2], 16) / 255.0 for i in (0, 2, 4))
+
+def prepare(operation, params):
+    """
+    params: form values, named as on the single-file endpoints
+    Returns (function, kwargs) to call as function(input_path, output_path, **kwargs).
+    Raises ValueError for an unknown operation or bad parameters.
+    """
+    if operation == 'watermark':
+        text = params.get('text')
+        if not text:
+            raise ValueError("watermark needs text")
+        return add_watermark, {"watermark_text": text}
+    if operation == 'add-page-numbers':
+        return add_page_numbers, {
+            "start_page": int(params.get('start_page', 1)),
+            "position": params.get('position', 'bottom-right'),
+            "font_size": int(params.get('font_size', 12)),
+            "color": parse_color(params.get('color', '#000000')),
+        }
+    if operation == 'add-password':
+        password = params.get('password')
+        if not password:
+            raise ValueError("add-password needs a password")
+        return add_password, {"password": password}
+    raise ValueError(f"Unknown operation: {operation}")
+
+def _process(chunk, func, kwargs, output_root):
+    """
+    Worker: run func on each input. Never raises for a bad file; the error
+    goes into that file's result instead.
+    Returns [(bytes or None, error or None, seconds)].
+    """
+    results = []
+    for input_path in chunk:
+        output_path = shard_path(output_root, f"batch_{uuid.uuid4()}.pdf", create=True)
+        started = time.perf_counter()
+        try:
+            func(input_path, output_path, **kwargs)
+            with open(output_path, "rb") as f:
+                results.append((f.read(), None, time.perf_counter() - started))
+        except Exception as e:
+            # Don't leak server paths into the manifest
+            error = (str(e) or e.__class__.__name__).replace(input_path, os.path.basename(input_path))
+            results.append((None, error, time.perf_counter() - started))
+        finally:
+            if os.path.exists(output_path):
+                os.remove(output_path)
+    return results
+
+def _entry_name(prefix, filename, taken):
+    base = os.path.splitext(os.path.basename(filename or "document.pdf"))[0] or "document"
+    name = f"{prefix}_{base}.pdf"
+    n = 1
+    while name in taken:
+        n += 1
+        name = f"{prefix}_{base}_{n}.pdf"
+    taken.add(name)
+    return name
+
+def run_batch(operation, func, kwargs, inputs, output_root, workers=None):
+    """
+    inputs: list of (input_path, original filename)
+    output_root: where workers write their intermediate files
+    Yields (name, bytes) for stream_zip: one entry per file that succeeded,
+    then manifest.json listing every input with its status.
+    """
+    workers = workers or default_workers()
+    prefix = OPERATIONS[operation]
+    chunks = [[path] for path, _ in inputs]
+    manifest = []
+    taken = set()
+    started = time.perf_counter()
+    results = (result for chunk in run_chunks(_process, chunks, workers, func, kwargs, output_root) for result in chunk)
+    for (_, filename), (data, error, seconds) in zip(inputs, results):
+        item = {"file": filename, "status": "ok" if error is None else "error", "seconds": round(seconds, 3)}
+        if error is None:
+            item["output"] = _entry_name(prefix, filename, taken)
+            item["bytes"] = len(data)
+            yield item["output"], data
+        else:
+            item["error"] = error
+        manifest.append(item)
+    summary = {
+        "operation": operation,
+        "files": len(manifest),
+        "succeeded": sum(1 for item in manifest if item["status"] == "ok"),
+        "seconds": round(time.perf_counter() - started, 3),
+        "results": manifest,
+    }
+    yield "manifest.json", json.dumps(summary, indent=2).encode("utf-8")
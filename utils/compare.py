@@ -0,0 +1,274 @@
+"""
+Compare two versions of a PDF.
+
+Pages are aligned before anything is diffed: every page gets a digest (of
+its words, or of a coarse grayscale render in pixel mode) and the two digest
+sequences are matched with SequenceMatcher, so an inserted or removed page
+only shows up as itself and identical pages are never diffed. The pages of
+a changed block are paired in order by word overlap, and the pairs are
+diffed on a process pool:
+
+    text   the words of get_text("words"), matched with SequenceMatcher;
+           removed words are highlighted on the old page and added words on
+           the new one, at the boxes MuPDF reports for them
+    pixel  both pages rendered in grayscale and subtracted with NumPy, for
+           scans without a text layer; changed regions are boxed on both
+
+The report shows every aligned pair side by side, old version on the left,
+and frames a page that only exists on one side.
+"""
+import hashlib
+from difflib import SequenceMatcher
+import numpy as np
+import fitz  # PyMuPDF
+from utils.parallel import default_workers, page_chunks, run_chunks
+
+MODES = ('text', 'pixel')
+ADDED = (0, 0.8, 0)
+REMOVED = (1, 0, 0)
+PIXEL_DPI = 72
+HASH_DPI = 24
+
+_PIXEL_THRESHOLD = 48  # grey levels
+_CELL = 8  # pixels per side of a pixel-diff cell
+_CELL_PIXELS = 4  # changed pixels that make a cell count as changed
+_MIN_SIMILARITY = 0.3  # word overlap below which two pages are not paired
+_MAX_BLOCK = 10000  # page pairs scored in one changed block before pairing by position
+_GAP = 20  # points between the two pages of the report
+
+def _words(page):
+    # MuPDF's own order; sort=True re-sorts every word in Python and costs
+    # more than the extraction itself
+    return page.get_text("words")
+
+def _render(page, dpi):
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+def _signatures(pages, path, mode, side):
+    """
+    Worker: (digest, word set) per page. Pages without text get a digest of
+    their own in text mode, so blank and scanned pages never count as equal.
+    """
+    results = []
+    with fitz.open(path) as doc:
+        for pno in pages:
+            page = doc[pno]
+            if mode == 'pixel':
+                # Coarse grey levels so rendering noise doesn't split equal pages
+                image = _render(page, HASH_DPI) >> 4
+                results.append((hashlib.sha1(image.tobytes() + str(image.shape).encode()).hexdigest(), frozenset()))
+                continue
+            words = [w[4] for w in _words(page)]
+            digest = hashlib.sha1("\0".join(words).encode("utf-8")).hexdigest() if words else (side, pno)
+            results.append((digest, frozenset(words)))
+    return results
+
+def _similarity(a, b):
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def _pair_block(old, new, words1, words2):
+    """
+    Pair the pages of a changed block in order, maximizing word overlap
+    Returns [(old page or None, new page or None)]
+    """
+    if len(old) * len(new) > _MAX_BLOCK or not any(words1[a] for a in old):
+        rows = list(zip(old, new))
+        rows += [(a, None) for a in old[len(new):]] + [(None, b) for b in new[len(old):]]
+        return rows
+    # score[i][j]: best total overlap pairing old[:i] with new[:j]
+    score = [[0.0] * (len(new) + 1) for _ in range(len(old) + 1)]
+    for i, a in enumerate(old, 1):
+        for j, b in enumerate(new, 1):
+            best = max(score[i - 1][j], score[i][j - 1])
+            similarity = _similarity(words1[a], words2[b])
+            if similarity >= _MIN_SIMILARITY:
+                best = max(best, score[i - 1][j - 1] + similarity)
+            score[i][j] = best
+    rows = []
+    i, j = len(old), len(new)
+    while i or j:
+        if i and j and score[i][j] != max(score[i - 1][j], score[i][j - 1]):
+            rows.append((old[i - 1], new[j - 1]))
+            i, j = i - 1, j - 1
+        elif i and (not j or score[i][j] == score[i - 1][j]):
+            rows.append((old[i - 1], None))
+            i -= 1
+        else:
+            rows.append((None, new[j - 1]))
+            j -= 1
+    return rows[::-1]
+
+def align(signatures1, signatures2):
+    """
+    Returns [(old page or None, new page or None, changed)] in reading order
+    """
+    digests1 = [digest for digest, _ in signatures1]
+    digests2 = [digest for digest, _ in signatures2]
+    words1 = [words for _, words in signatures1]
+    words2 = [words for _, words in signatures2]
+    rows = []
+    matcher = SequenceMatcher(None, digests1, digests2, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == 'equal':
+            rows.extend((a, b, False) for a, b in zip(range(i1, i2), range(j1, j2)))
+        else:
+            rows.extend((a, b, True) for a, b in _pair_block(list(range(i1, i2)), list(range(j1, j2)), words1, words2))
+    return rows
+
+def _line_boxes(words, page):
+    """
+    One box per run of words on the same line, in the page's visible
+    (rotated) coordinates
+    """
+    boxes = []
+    line = None
+    for x0, y0, x1, y1, _, block_no, line_no, _ in words:
+        rect = fitz.Rect(x0, y0, x1, y1)
+        if (block_no, line_no) == line:
+            boxes[-1] |= rect
+        else:
+            boxes.append(rect)
+            line = (block_no, line_no)
+    return [tuple(box * page.rotation_matrix) for box in boxes]
+
+def _word_diff(page1, page2):
+    words1, words2 = _words(page1), _words(page2)
+    matcher = SequenceMatcher(None, [w[4] for w in words1], [w[4] for w in words2], autojunk=False)
+    removed, added = [], []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != 'equal':
+            removed.extend(_line_boxes(words1[i1:i2], page1))
+            added.extend(_line_boxes(words2[j1:j2], page2))
+    return removed, added
+
+def _regions(changed):
+    """
+    Bounding boxes, in pixels, of groups of changed cells; cells one apart
+    join the same group
+    """
+    height, width = changed.shape
+    rows, cols = -(-height // _CELL), -(-width // _CELL)
+    padded = np.zeros((rows * _CELL, cols * _CELL), dtype=bool)
+    padded[:height, :width] = changed
+    cells = padded.reshape(rows, _CELL, cols, _CELL).sum(axis=(1, 3)) >= _CELL_PIXELS
+    remaining = {tuple(cell) for cell in np.argwhere(cells)}
+    boxes = []
+    while remaining:
+        stack = [remaining.pop()]
+        top, left = bottom, right = stack[0]
+        while stack:
+            r, c = stack.pop()
+            top, bottom, left, right = min(top, r), max(bottom, r), min(left, c), max(right, c)
+            for dr in (-2, -1, 0, 1, 2):
+                for dc in (-2, -1, 0, 1, 2):
+                    neighbour = (r + dr, c + dc)
+                    if neighbour in remaining:
+                        remaining.remove(neighbour)
+                        stack.append(neighbour)
+        boxes.append((left * _CELL, top * _CELL, min(width, (right + 1) * _CELL), min(height, (bottom + 1) * _CELL)))
+    return boxes
+
+def _pixel_diff(page1, page2):
+    image1, image2 = _render(page1, PIXEL_DPI), _render(page2, PIXEL_DPI)
+    height = min(image1.shape[0], image2.shape[0])
+    width = min(image1.shape[1], image2.shape[1])
+    changed = np.abs(image1[:height, :width].astype(np.int16) - image2[:height, :width]) > _PIXEL_THRESHOLD
+    scale = 72 / PIXEL_DPI
+    boxes = [tuple(v * scale for v in box) for box in _regions(changed)]
+    return boxes, boxes
+
+def _diff_pairs(pairs, path1, path2, mode):
+    """
+    Worker: (removed boxes on the old page, added boxes on the new page) per pair
+    """
+    diff = _pixel_diff if mode == 'pixel' else _word_diff
+    with fitz.open(path1) as doc1, fitz.open(path2) as doc2:
+        return [diff(doc1[a], doc2[b]) for a, b in pairs]
+
+def _mark(page, boxes, offset, color, mode):
+    if not boxes:
+        return
+    rects = [fitz.Rect(box) + (offset, 0, offset, 0) for box in boxes]
+    if mode == 'pixel':
+        for rect in rects:
+            annot = page.add_rect_annot(rect)
+            annot.set_colors(stroke=color)
+            annot.set_border(width=1.5)
+            annot.update()
+    else:
+        # One annotation per side with a quad per line keeps the report light
+        annot = page.add_highlight_annot(quads=rects)
+        annot.set_colors(stroke=color)
+        annot.update()
+
+def _frame(page, rect, color):
+    annot = page.add_rect_annot(rect)
+    annot.set_colors(stroke=color)
+    annot.set_border(width=4)
+    annot.update()
+
+def _show(page, rect, doc, pno):
+    # show_pdf_page draws nothing for a rotated source page with a cropbox
+    # offset, so show it unrotated and turn it while placing it
+    rotation = doc[pno].rotation
+    if rotation:
+        doc[pno].set_rotation(0)
+    page.show_pdf_page(rect, doc, pno, rotate=-rotation)
+    if rotation:
+        doc[pno].set_rotation(rotation)
+
+def _report(doc1, doc2, rows, diffs, mode):
+    out = fitz.open()
+    for a, b, _ in rows:
+        old_rect = doc1[a].rect if a is not None else doc2[b].rect
+        new_rect = doc2[b].rect if b is not None else old_rect
+        offset = old_rect.width + _GAP
+        page = out.new_page(width=offset + new_rect.width, height=max(old_rect.height, new_rect.height))
+        left = fitz.Rect(0, 0, old_rect.width, old_rect.height)
+        right = fitz.Rect(offset, 0, offset + new_rect.width, new_rect.height)
+        if a is not None:
+            _show(page, left, doc1, a)
+        if b is not None:
+            _show(page, right, doc2, b)
+        if a is None:
+            _frame(page, right, ADDED)
+        elif b is None:
+            _frame(page, left, REMOVED)
+        elif (a, b) in diffs:
+            removed, added = diffs[(a, b)]
+            _mark(page, removed, 0, REMOVED, mode)
+            _mark(page, added, offset, ADDED, mode)
+    return out
+
+def compare_files(path1, path2, output_path, mode='text', workers=None):
+    """
+    Write a side-by-side report of path1 (old) against path2 (new)
+    mode: 'text' for word differences, 'pixel' for scanned documents
+    Returns counts of aligned, changed, added and removed pages.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown comparison mode: {mode}")
+    workers = workers or default_workers()
+    with fitz.open(path1) as doc1, fitz.open(path2) as doc2:
+        signatures = []
+        for side, (path, doc) in enumerate(((path1, doc1), (path2, doc2))):
+            chunks = page_chunks(range(doc.page_count), workers, min_chunk=8)
+            signatures.append([s for chunk in run_chunks(_signatures, chunks, workers, path, mode, side) for s in chunk])
+        rows = align(*signatures)
+        pairs = [(a, b) for a, b, changed in rows if changed and a is not None and b is not None]
+        chunks = page_chunks(pairs, workers, min_chunk=2)
+        diffs = {}
+        for chunk, found in zip(chunks, run_chunks(_diff_pairs, chunks, workers, path1, path2, mode)):
+            diffs.update((pair, boxes) for pair, boxes in zip(chunk, found) if boxes[0] or boxes[1])
+        out = _report(doc1, doc2, rows, diffs, mode)
+        try:
+            out.save(output_path, garbage=1, deflate=True)
+        finally:
+            out.close()
+    return {
+        "pages": len(rows),
+        "changed": len(diffs),
+        "added": sum(1 for a, _, _ in rows if a is None),
+        "removed": sum(1 for _, b, _ in rows if b is None),
+    }
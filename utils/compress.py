@@ -0,0 +1,135 @@
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+import os, io, time, shutil
+import fitz  # PyMuPDF
+
+# preset -> image target DPI and JPEG quality (None: leave images untouched)
+PRESETS = {
+    'screen': {'dpi': 72, 'quality': 40},
+    'ebook': {'dpi': 150, 'quality': 60},
+    'print': {'dpi': 300, 'quality': 85},
+    'lossless': None,
+}
+
+# Images are only resampled when they exceed the target by this factor,
+# re-encoding a 160 DPI image down to 150 costs quality for no real gain
+DPI_SLACK = 1.2
+MIN_IMAGE_SIDE = 32
+
+def _image_placements(doc):
+    """
+    Returns {xref: (page_number, effective_dpi, image info tuple)} using the
+    highest resolution over the pages each image is placed on
+    """
+    placements = {}
+    for page in doc:
+        for img in page.get_images(full=True):
+            xref, width, height = img[0], img[2], img[3]
+            # get_image_bbox reads the placement from the content stream, unlike
+            # get_image_rects it doesn't decode the image to hash it
+            try:
+                rect = page.get_image_bbox(img)
+            except ValueError:
+                continue
+            if not rect.is_valid or rect.is_empty or rect.is_infinite:
+                continue
+            dpi = max(width * 72 / rect.width, height * 72 / rect.height)
+            if xref not in placements or dpi > placements[xref][1]:
+                placements[xref] = (page.number, dpi, img)
+    return placements
+
+def _resample_image(doc, xref, dpi, target_dpi, quality):
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha:
+        pix = fitz.Pixmap(pix, 0)
+    if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    mode = "L" if pix.n == 1 else "RGB"
+    img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
+    scale = target_dpi / dpi
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    img = img.resize(size, Image.LANCZOS)
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=quality, optimize=True)
+    return buf.getvalue()
+
+def compress_doc(doc, preset='ebook'):
+    """
+    Downsample and re-encode embedded images above the preset's DPI in place.
+    Returns (save_options, images_resampled); the save options garbage-collect
+    unused xrefs, merge duplicate objects and write object streams.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown compression preset: {preset}")
+    settings = PRESETS[preset]
+    resampled = 0
+    if settings:
+        for xref, (page_number, dpi, img) in _image_placements(doc).items():
+            smask, width, height, bpc = img[1], img[2], img[3], img[4]
+            # Masked and bilevel images (scans, stencils) don't survive JPEG
+            if smask or bpc == 1 or min(width, height) < MIN_IMAGE_SIDE:
+                continue
+            if dpi <= settings['dpi'] * DPI_SLACK:
+                continue
+            try:
+                data = _resample_image(doc, xref, dpi, settings['dpi'], settings['quality'])
+            except Exception as e:
+                print(f"Skipping image {xref}: {e}")
+                continue
+            if len(data) < len(doc.xref_stream_raw(xref) or b""):
+                doc[page_number].replace_image(xref, stream=data)
+                resampled += 1
+    save_options = {"garbage": 4, "deflate": True, "deflate_images": True, "deflate_fonts": True, "clean": True, "use_objstms": 1}
+    return save_options, resampled
+
+def compress_file(input_path, output_path, preset='ebook'):
+    """
+    Returns {'preset', 'original_size', 'compressed_size', 'ratio', 'images_resampled', 'seconds'}
+    If the result would be larger than the input the input is copied unchanged.
+    """
+    started = time.perf_counter()
+    doc = fitz.open(input_path)
+    save_options, resampled = compress_doc(doc, preset)
+    doc.save(output_path, **save_options)
+    doc.close()
+    original_size = os.path.getsize(input_path)
+    if os.path.getsize(output_path) >= original_size:
+        shutil.copyfile(input_path, output_path)
+    compressed_size = os.path.getsize(output_path)
+    return {
+        "preset": preset,
+        "original_size": original_size,
+        "compressed_size": compressed_size,
+        "ratio": compressed_size / original_size if original_size else 1.0,
+        "images_resampled": resampled,
+        "seconds": time.perf_counter() - started,
+    }
+
+def compress_file_pypdf2(input_path, output_path, preset='ebook'):
+    """
+    PyPDF2 fallback for compress_file, same result dict. It only deflates
+    content streams; images are never resampled whatever the preset.
+    """
+    if preset not in PRESETS:
+        raise ValueError(f"Unknown compression preset: {preset}")
+    started = time.perf_counter()
+    reader = PdfReader(input_path)
+    writer = PdfWriter()
+    for page in reader.pages:
+        writer.add_page(page)
+    for page in writer.pages:
+        page.compress_content_streams()
+    with open(output_path, "wb") as f:
+        writer.write(f)
+    original_size = os.path.getsize(input_path)
+    if os.path.getsize(output_path) >= original_size:
+        shutil.copyfile(input_path, output_path)
+    compressed_size = os.path.getsize(output_path)
+    return {
+        "preset": preset,
+        "original_size": original_size,
+        "compressed_size": compressed_size,
+        "ratio": compressed_size / original_size if original_size else 1.0,
+        "images_resampled": 0,
+        "seconds": time.perf_counter() - started,
+    }
@@ -0,0 +1,103 @@
+from PIL import Image
+from utils.parallel import default_workers, page_chunks, run_chunks
+import io
+import numpy as np
+import fitz  # PyMuPDF
+
+class ImagePdfWriter:
+    """
+    Minimal PDF writer for pages that are a single JPEG each.
+    Every page is written to the file as soon as it is added; only object
+    offsets are kept in memory, so output size doesn't affect memory use.
+    """
+    def __init__(self, f):
+        self.f = f
+        self.offsets = {}
+        self.kids = []
+        self.next_obj = 3  # 1 = catalog, 2 = page tree, both written by close()
+        self.f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+
+    def _pos(self):
+        return self.f.tell()
+
+    def _write_obj(self, num, body, stream=None):
+        self.offsets[num] = self._pos()
+        self.f.write(f"{num} 0 obj\n".encode())
+        self.f.write(body.encode())
+        if stream is not None:
+            self.f.write(b"\nstream\n")
+            self.f.write(stream)
+            self.f.write(b"\nendstream")
+        self.f.write(b"\nendobj\n")
+
+    def add_jpeg_page(self, data, pixel_width, pixel_height, width, height, gray=True):
+        """
+        width, height: page size in points
+        """
+        image, content, page = self.next_obj, self.next_obj + 1, self.next_obj + 2
+        self.next_obj += 3
+        colorspace = "/DeviceGray" if gray else "/DeviceRGB"
+        self._write_obj(image, f"<< /Type /XObject /Subtype /Image /Width {pixel_width} /Height {pixel_height} "
+                               f"/ColorSpace {colorspace} /BitsPerComponent 8 /Filter /DCTDecode /Length {len(data)} >>", data)
+        ops = f"q {width:.2f} 0 0 {height:.2f} 0 0 cm /Im0 Do Q".encode()
+        self._write_obj(content, f"<< /Length {len(ops)} >>", ops)
+        self._write_obj(page, f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+                              f"/Resources << /XObject << /Im0 {image} 0 R >> >> /Contents {content} 0 R >>")
+        self.kids.append(page)
+
+    def close(self):
+        kids = " ".join(f"{k} 0 R" for k in self.kids)
+        self._write_obj(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.kids)} >>")
+        self._write_obj(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self._pos()
+        self.f.write(f"xref\n0 {self.next_obj}\n0000000000 65535 f \n".encode())
+        for num in range(1, self.next_obj):
+            self.f.write(f"{self.offsets[num]:010d} 00000 n \n".encode())
+        self.f.write(f"trailer\n<< /Size {self.next_obj} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode())
+
+def scan_effect(gray, rng):
+    """
+    gray: PIL "L" image. Slight misalignment, then grain, contrast and
+    brightness applied to the pixels in a single NumPy pass.
+    """
+    # Pillow's C rotation is already vectorised; NumPy has no cheap equivalent
+    gray = gray.rotate(rng.uniform(-0.5, 0.5), resample=Image.BICUBIC, expand=False, fillcolor=255)
+    pixels = np.asarray(gray, dtype=np.float32)
+    contrast = rng.uniform(1.1, 1.3)
+    brightness = rng.uniform(0.95, 1.05)
+    # Same formulas as ImageEnhance.Contrast/Brightness: pivot on the mean grey level
+    mean = pixels.mean()
+    noise = rng.normal(0, 2, pixels.shape).astype(np.float32)
+    pixels = ((pixels + noise - mean) * contrast + mean) * brightness
+    return Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8), "L")
+
+def _scan_chunk(pages, input_path, zoom, quality):
+    # Runs in a worker process; returns small JPEGs, never full bitmaps
+    rng = np.random.default_rng()
+    results = []
+    with fitz.open(input_path) as doc:
+        for i in pages:
+            page = doc[i]
+            pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+            img = scan_effect(Image.frombytes("L", [pix.width, pix.height], pix.samples), rng)
+            buf = io.BytesIO()
+            img.save(buf, "JPEG", quality=quality)
+            results.append((buf.getvalue(), img.width, img.height, page.rect.width, page.rect.height))
+    return results
+
+def fake_scan_file(input_path, output_path, zoom=2, quality=60, workers=None):
+    """
+    Pages are rendered and degraded across a process pool, a few pages at a
+    time, and streamed into the output PDF in order. Returns the page count.
+    """
+    with fitz.open(input_path) as doc:
+        page_count = len(doc)
+    workers = workers or default_workers(limit=page_count // 2 or 1)
+    chunks = page_chunks(range(page_count), workers, min_chunk=1, max_chunk=4)
+    with open(output_path, "wb") as f:
+        writer = ImagePdfWriter(f)
+        for results in run_chunks(_scan_chunk, chunks, workers, input_path, zoom, quality):
+            for data, pixel_width, pixel_height, width, height in results:
+                writer.add_jpeg_page(data, pixel_width, pixel_height, width, height)
+        writer.close()
+    return page_count
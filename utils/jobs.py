@@ -0,0 +1,154 @@
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+import os, re, json, time, uuid, threading
+from utils.lifecycle import shard_path
+
+# Job fields written to the state file and returned by get()
+_STATUS = ("id", "operation", "status", "submitted_at", "started_at", "finished_at", "error")
+_PUBLIC = _STATUS + ("output_path", "download_name")
+_JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+class QueueFull(Exception):
+    pass
+
+class JobQueue:
+    """
+    Runs heavy utils.pdf_tools calls on a bounded process pool.
+    max_queue: queued + running jobs accepted before submit raises QueueFull
+    op_limits: dict of operation -> max jobs of that kind running at once
+    state_dir: where every job's state is written as <id>.json, so that any
+    process sharing the directory (e.g. the other gunicorn workers) can
+    answer get() and status() for it. The pool and the limits stay per
+    process: jobs run in the process they were submitted to.
+    """
+    def __init__(self, max_workers=None, max_queue=32, op_limits=None, keep_finished=500, state_dir=None):
+        self.max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_queue = max_queue
+        self.op_limits = op_limits or {}
+        self.keep_finished = keep_finished
+        self.state_dir = state_dir
+        if state_dir:
+            os.makedirs(state_dir, exist_ok=True)
+        self._pool = None
+        self._lock = threading.RLock()
+        self._jobs = {}
+        self._finished = deque()
+        self._waiting = {}
+        self._running = {}
+
+    def _executor(self):
+        # Created lazily so gunicorn forks its workers before the pool exists
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _save(self, job):
+        # Caller holds self._lock
+        if not self.state_dir:
+            return
+        path = shard_path(self.state_dir, f"{job['id']}.json", create=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({k: job[k] for k in _PUBLIC}, f)
+        os.replace(tmp_path, path)
+
+    def _load(self, job_id):
+        """
+        State of a job submitted to another process, or None
+        """
+        if not self.state_dir or not _JOB_ID.fullmatch(job_id):
+            return None
+        try:
+            with open(shard_path(self.state_dir, f"{job_id}.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def depth(self):
+        return sum(1 for job in self._jobs.values() if job["status"] in ("queued", "running"))
+
+    def submit(self, operation, func, args, output_path, download_name, on_finish=None):
+        with self._lock:
+            if self.depth() >= self.max_queue:
+                raise QueueFull(f"Job queue is full ({self.max_queue} jobs pending)")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id,
+                "operation": operation,
+                "status": "queued",
+                "submitted_at": time.time(),
+                "started_at": None,
+                "finished_at": None,
+                "error": None,
+                "output_path": output_path,
+                "download_name": download_name,
+                "_call": (func, args),
+                "_on_finish": on_finish,
+            }
+            self._save(self._jobs[job_id])
+            self._waiting.setdefault(operation, deque()).append(job_id)
+            self._dispatch(operation)
+        return job_id
+
+    def _dispatch(self, operation):
+        # Caller holds self._lock
+        limit = self.op_limits.get(operation, self.max_workers)
+        waiting = self._waiting.get(operation)
+        while waiting and self._running.get(operation, 0) < limit:
+            job = self._jobs[waiting.popleft()]
+            func, args = job.pop("_call")
+            job["status"] = "running"
+            job["started_at"] = time.time()
+            self._running[operation] = self._running.get(operation, 0) + 1
+            self._save(job)
+            future = self._executor().submit(func, *args)
+            future.add_done_callback(lambda f, job_id=job["id"]: self._on_done(job_id, f))
+
+    def _on_done(self, job_id, future):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["finished_at"] = time.time()
+            try:
+                result = future.result()
+            except Exception as e:
+                job["status"] = "failed"
+                job["error"] = str(e) or e.__class__.__name__
+            else:
+                # pdf_to_excel and friends signal "nothing to do" by returning False
+                if result is False or not os.path.exists(job["output_path"]):
+                    job["status"] = "failed"
+                    job["error"] = "Operation produced no output"
+                else:
+                    job["status"] = "done"
+            self._save(job)
+            on_finish = job.pop("_on_finish")
+            if on_finish is not None:
+                try:
+                    on_finish(job)
+                except Exception as e:
+                    print(f"Job cleanup error: {e}")
+            operation = job["operation"]
+            self._running[operation] -= 1
+            self._finished.append(job_id)
+            while len(self._finished) > self.keep_finished:
+                self._jobs.pop(self._finished.popleft(), None)
+            self._dispatch(operation)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return self._load(job_id)
+            return {k: job[k] for k in _PUBLIC}
+
+    def status(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                job = self._load(job_id)
+                return job and {k: job[k] for k in _STATUS}
+            info = {k: job[k] for k in _STATUS}
+            waiting = list(self._waiting.get(job["operation"], ()))
+            if job_id in waiting:
+                info["position"] = waiting.index(job_id) + 1
+            return info
@@ -0,0 +1,124 @@
+"""
+Lifecycle of files under uploads/ and outputs/.
+
+Files live in 256 shard folders (<root>/<2 hex chars>/<name>) so no single
+directory grows to millions of entries. A background janitor expires files
+by age and, when a disk quota is set, evicts the least recently used ones.
+Recency is the file mtime; callers refresh it with touch() when a file is
+used again (e.g. an open editor session).
+"""
+import os, time, hashlib, threading
+
+def shard(name):
+    return hashlib.sha1(name.encode()).hexdigest()[:2]
+
+def shard_path(root, name, create=False):
+    """
+    Where name lives under root. create=True makes the shard folder.
+    """
+    name = os.path.basename(name)
+    folder = os.path.join(root, shard(name))
+    if create:
+        os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, name)
+
+def find_path(root, name):
+    """
+    shard_path for reading: files written before sharding sit directly in root
+    """
+    path = shard_path(root, name)
+    if not os.path.exists(path):
+        legacy = os.path.join(root, os.path.basename(name))
+        if os.path.exists(legacy):
+            return legacy
+    return path
+
+def touch(path):
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+
+class StorageArea:
+    """
+    ttl: seconds since last use before a file expires
+    in_use: optional callable(name) -> bool; such files are never removed
+    """
+    def __init__(self, root, ttl, in_use=None):
+        self.root = root
+        self.ttl = ttl
+        self.in_use = in_use or (lambda name: False)
+
+    def files(self):
+        # Shard folders plus anything left at the top level from before sharding
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, name, st.st_mtime, st.st_size
+
+class Janitor(threading.Thread):
+    """
+    Sweeps on start and then every `interval` seconds: first removes expired
+    files, then, if the areas together exceed quota_bytes, removes the least
+    recently used files until they are back under 90% of it. usage holds the
+    bytes left in each area (by root) after the last sweep.
+    """
+    def __init__(self, areas, quota_bytes=0, interval=300):
+        super().__init__(name="storage-janitor", daemon=True)
+        self.areas = areas
+        self.quota_bytes = quota_bytes
+        self.interval = interval
+        self.removed = {"expired": 0, "quota": 0}
+        self.usage = {}
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while True:
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Storage janitor error: {e}")
+            if self._stop_event.wait(self.interval):
+                break
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _remove(self, path, reason):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            return False  # e.g. still open on Windows; try again next sweep
+        self.removed[reason] += 1
+        return True
+
+    def sweep(self, now=None):
+        now = now or time.time()
+        kept = []
+        usage = {area.root: 0 for area in self.areas}
+        for area in self.areas:
+            for path, name, mtime, size in area.files():
+                if area.in_use(name):
+                    usage[area.root] += size
+                    continue
+                if now - mtime > area.ttl and self._remove(path, "expired"):
+                    continue
+                kept.append((mtime, size, path, area.root))
+                usage[area.root] += size
+        total = sum(usage.values())
+        if self.quota_bytes and total > self.quota_bytes:
+            kept.sort()
+            for mtime, size, path, root in kept:
+                if total <= self.quota_bytes * 0.9:
+                    break
+                if self._remove(path, "quota"):
+                    total -= size
+                    usage[root] -= size
+        self.usage = usage
+        return total
@@ -0,0 +1,67 @@
+import os
+from PyPDF2 import PdfWriter
+import fitz  # PyMuPDF
+
+def source_outline(src, title, start):
+    """
+    One top-level entry for a source file, with the file's own outline
+    nested under it and shifted to the pages it lands on in the output
+    """
+    toc = [[1, title, start + 1]]
+    for level, entry_title, page in src.get_toc(simple=True):
+        toc.append([level + 1, entry_title, start + page if page > 0 else start + 1])
+    return toc
+
+def merge_files(paths, output_path, titles=None, outline=True, batch_size=50):
+    """
+    Append every input with insert_pdf, batch_size sources at a time.
+    Each batch is appended to the output with an incremental save and the
+    document is reopened, so only one batch of copied objects is held in
+    memory however many inputs there are. The final save rewrites the file
+    once with garbage=4, which merges identical objects (fonts, images,
+    ICC profiles) shared between sources.
+    titles: outline title per source, defaults to the file names
+    Returns the number of pages written.
+    """
+    titles = titles or [os.path.basename(p) for p in paths]
+    tmp_path = output_path + ".part"
+    toc = []
+    doc = fitz.open()
+    try:
+        for n, (path, title) in enumerate(zip(paths, titles)):
+            # The part file is written by the first flush that has pages in it
+            if n and n % batch_size == 0 and doc.page_count:
+                if os.path.exists(tmp_path):
+                    doc.saveIncr()
+                else:
+                    doc.save(tmp_path)
+                doc.close()
+                fitz.TOOLS.store_shrink(100)
+                doc = fitz.open(tmp_path)
+            with fitz.open(path) as src:
+                if not src.page_count:
+                    continue  # insert_pdf rejects an empty page tree
+                if outline:
+                    toc.extend(source_outline(src, title, doc.page_count))
+                doc.insert_pdf(src)
+        if outline:
+            doc.set_toc(toc)
+        doc.save(output_path, garbage=4, deflate=True, use_objstms=1)
+        return doc.page_count
+    finally:
+        doc.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def merge_files_pypdf2(paths, output_path, titles=None, outline=True):
+    """
+    PyPDF2 fallback for merge_files: one outline entry per source with its
+    own outline nested under it, no object deduplication
+    """
+    titles = titles or [os.path.basename(p) for p in paths]
+    writer = PdfWriter()
+    for path, title in zip(paths, titles):
+        writer.append(path, outline_item=title if outline else None, import_outline=outline)
+    with open(output_path, "wb") as f:
+        writer.write(f)
+    return len(writer.pages)
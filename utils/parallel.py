@@ -0,0 +1,63 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FuturesTimeout
+from collections import deque
+import os, time
+
+def default_workers(limit=None):
+    workers = max(1, os.cpu_count() or 1)
+    return min(workers, limit) if limit else workers
+
+def page_chunks(page_numbers, workers, min_chunk=4, max_chunk=None):
+    """
+    Split page indexes into contiguous chunks, a few per worker so that
+    slow pages don't leave the rest of the pool idle.
+    max_chunk caps the chunk size when results are held in memory.
+    """
+    page_numbers = list(page_numbers)
+    if not page_numbers:
+        return []
+    size = max(min_chunk, -(-len(page_numbers) // (workers * 4)))
+    if max_chunk:
+        size = min(size, max_chunk)
+    return [page_numbers[i:i + size] for i in range(0, len(page_numbers), size)]
+
+def run_chunks(func, chunks, workers, *args, timeout=None):
+    """
+    Yield func(chunk, *args) for every chunk, in chunk order.
+    Runs in-process when a pool would not help. Otherwise at most two chunks
+    per worker are in flight, so results never pile up faster than they are
+    consumed.
+    timeout: seconds for the whole run; when set, work always goes through a
+    pool so it can be abandoned, and TimeoutError is raised once it expires.
+    """
+    if timeout is None and (workers <= 1 or len(chunks) <= 1):
+        for chunk in chunks:
+            yield func(chunk, *args)
+        return
+
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    pool = ProcessPoolExecutor(max_workers=max(1, min(workers, len(chunks))))
+    timed_out = False
+    try:
+        remaining = iter(chunks)
+        pending = deque()
+        for chunk in remaining:
+            pending.append(pool.submit(func, chunk, *args))
+            if len(pending) >= workers * 2:
+                break
+        while pending:
+            wait = max(0, deadline - time.monotonic()) if deadline is not None else None
+            try:
+                result = pending.popleft().result(timeout=wait)
+            except FuturesTimeout:
+                timed_out = True
+                raise TimeoutError(f"Gave up after {timeout} seconds")
+            chunk = next(remaining, None)
+            if chunk is not None:
+                pending.append(pool.submit(func, chunk, *args))
+            yield result
+    finally:
+        if timed_out:
+            # ProcessPoolExecutor cannot cancel running tasks; stop the workers
+            for process in list(pool._processes.values()):
+                process.terminate()
+        pool.shutdown(wait=not timed_out, cancel_futures=True)
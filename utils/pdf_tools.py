@@ -1,62 +1,91 @@
-from PyPDF2 import PdfMerger, PdfReader, PdfWriter
-from PIL import Image, ImageOps, ImageEnhance, ImageFilter
-from pdf2docx import Converter
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-import os, io, re, difflib, random
-import numpy as np
+from PyPDF2 import PdfReader, PdfWriter, PasswordType
+from PyPDF2.errors import PdfReadError
+from PIL import Image, ImageFilter
+import os, io, re, shutil
 import fitz  # PyMuPDF
 import pdfkit
-import pandas as pd
-import pdfplumber
+from utils.raster import rasterize_pdf
+from utils.compress import compress_file, compress_file_pypdf2
+from utils.redact import redact_patterns
+from utils.fakescan import fake_scan_file
+from utils.tables import iter_tables, write_tables
+from utils.word import convert_to_docx
+from utils.merge import merge_files, merge_files_pypdf2
+from utils.split import plan as plan_split, write_parts
+from utils.compare import compare_files
+from utils.textindex import hit_rects
+from utils.slides import pdf_to_slides
+from utils.backends import choose as choose_backend
+from utils.watermark import stamp_doc
 
-def merge_pdfs(files, output):
-    merger = PdfMerger()
-    for file in files:
-        merger.append(file)
-    merger.write(output)
-    merger.close()
+def merge_pdfs(files, output, titles=None, backend=None):
+    """
+    titles: outline entry per input file, defaults to the file names
+    backend: 'fitz' or 'pypdf2', None for the configured one (see utils.backends)
+    """
+    if choose_backend('merge', backend) == 'pypdf2':
+        return merge_files_pypdf2(files, output, titles)
+    return merge_files(files, output, titles)
 
-def split_pdf(input_path, output_folder):
+def iter_split_parts(input_path, parts, workers=None, backend=None):
+    """
+    Yield (name, bytes) for every part of plan_split(), in order
+    workers: writer processes, None for one per CPU (fitz backend)
+    """
+    if choose_backend('split', backend) == 'pypdf2':
+        return _iter_split_parts_pypdf2(input_path, parts)
+    return write_parts(input_path, parts, workers)
+
+def _iter_split_parts_pypdf2(input_path, parts):
     reader = PdfReader(input_path)
-    output_files = []
-    for i, page in enumerate(reader.pages):
+    for name, pages, toc in parts:
         writer = PdfWriter()
-        writer.add_page(page)
-        output_filename = f"split_page_{i+1}.pdf"
+        for pno in pages:
+            writer.add_page(reader.pages[pno])
+        parents = {}
+        for level, title, page in toc:
+            parents[level] = writer.add_outline_item(title, page - 1, parent=parents.get(level - 1))
+        buf = io.BytesIO()
+        writer.write(buf)
+        yield name, buf.getvalue()
+
+def iter_split_pages(input_path, backend=None):
+    """
+    Yield (name, bytes) for every page as its own single-page PDF
+    """
+    return iter_split_parts(input_path, plan_split(input_path), backend=backend)
+
+def split_pdf(input_path, output_folder, mode='pages', value=None, workers=None, backend=None):
+    """
+    mode: 'pages', 'ranges', 'chunk', 'size' or 'bookmarks', with value the
+    ranges string, pages per file or bytes per file (see utils.split)
+    """
+    output_files = []
+    for output_filename, data in iter_split_parts(input_path, plan_split(input_path, mode, value), workers, backend):
         output_path = os.path.join(output_folder, output_filename)
         with open(output_path, "wb") as f:
-            writer.write(f)
+            f.write(data)
         output_files.append(output_path)
     return output_files
 
-def pdf_to_excel(input_path, output_path):
+def pdf_to_excel(input_path, output_path, fmt='xlsx', workers=None):
     """
     Extract tables from PDF and save to Excel
+    fmt: 'xlsx' (one sheet per table), 'csv' or 'jsonl'
+    workers: extraction processes, None for one per CPU
+    Returns False when no tables were found
     """
-    all_tables = []
-    with pdfplumber.open(input_path) as pdf:
-        for page in pdf.pages:
-            tables = page.extract_tables()
-            for table in tables:
-                df = pd.DataFrame(table[1:], columns=table[0])
-                all_tables.append(df)
-    
-    if all_tables:
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            for i, df in enumerate(all_tables):
-                df.to_excel(writer, sheet_name=f'Table_{i+1}', index=False)
-        return True
-    return False
+    return write_tables(iter_tables(input_path, workers), output_path, fmt) > 0
 
-def compress_pdf(input_path, output_path):
-    reader = PdfReader(input_path)
-    writer = PdfWriter()
-    for page in reader.pages:
-        page.compress_content_streams()
-        writer.add_page(page)
-    with open(output_path, "wb") as f:
-        writer.write(f)
+def compress_pdf(input_path, output_path, preset='ebook', backend=None):
+    """
+    preset: 'screen' (72 DPI), 'ebook' (150 DPI), 'print' (300 DPI) or 'lossless'
+    Returns before/after sizes and timing, see utils.compress.compress_file.
+    The pypdf2 backend only deflates content streams.
+    """
+    if choose_backend('compress', backend) == 'pypdf2':
+        return compress_file_pypdf2(input_path, output_path, preset)
+    return compress_file(input_path, output_path, preset)
 
 def images_to_pdf(image_paths, output_path):
     images = []
@@ -69,12 +98,24 @@ def images_to_pdf(image_paths, output_path):
     if images:
         images[0].save(output_path, save_all=True, append_images=images[1:])
 
-def pdf_to_word(pdf_path, docx_path):
-    cv = Converter(pdf_path)
-    cv.convert(docx_path, start=0, end=None)
-    cv.close()
+def pdf_to_word(pdf_path, docx_path, pages=None, workers=None, timeout=None):
+    """
+    pages: range string like "1-3,5", None for all
+    workers: parsing processes, None for one per CPU
+    timeout: seconds before the conversion is abandoned with TimeoutError
+    """
+    page_numbers = parse_page_ranges(pages) if pages else None
+    return convert_to_docx(pdf_path, docx_path, page_numbers, workers, timeout)
 
-def rotate_pdf(input_path, output_path, rotation=90):
+def rotate_pdf(input_path, output_path, rotation=90, backend=None):
+    if choose_backend('rotate', backend) == 'pypdf2':
+        return _rotate_pdf_pypdf2(input_path, output_path, rotation)
+    doc = fitz.open(input_path)
+    rotate_doc(doc, rotation)
+    doc.save(output_path)
+    doc.close()
+
+def _rotate_pdf_pypdf2(input_path, output_path, rotation):
     reader = PdfReader(input_path)
     writer = PdfWriter()
     for page in reader.pages:
@@ -83,38 +124,62 @@ def rotate_pdf(input_path, output_path, rotation=90):
     with open(output_path, "wb") as f:
         writer.write(f)
 
-def add_watermark(input_path, output_path, watermark_text):
-    # Create watermark PDF in memory
-    packet = io.BytesIO()
-    can = canvas.Canvas(packet, pagesize=letter)
-    can.setFont("Helvetica", 40)
-    can.setFillAlpha(0.3)
-    can.saveState()
-    can.translate(300, 400)
-    can.rotate(45)
-    can.drawCentredString(0, 0, watermark_text)
-    can.restoreState()
-    can.save()
-    packet.seek(0)
-    
-    watermark_pdf = PdfReader(packet)
-    watermark_page = watermark_pdf.pages[0]
-    
-    reader = PdfReader(input_path)
-    writer = PdfWriter()
-    
-    for page in reader.pages:
-        page.merge_page(watermark_page)
-        writer.add_page(page)
-        
-    with open(output_path, "wb") as f:
-        writer.write(f)
+def insert_upright_text(page, point, text, **kwargs):
+    """
+    Insert text at a point given in the page's visible (rotated) coordinates
+    so that it reads upright however the page is rotated
+    """
+    page.insert_text(fitz.Point(point) * page.derotation_matrix, text, rotate=page.rotation, **kwargs)
+
+def rotate_doc(doc, rotation=90):
+    for page in doc:
+        page.set_rotation((page.rotation + rotation) % 360)
 
-def annotate_pdf(input_path, output_path, annotations):
+def add_watermark_doc(doc, watermark_text, font_size=40, opacity=0.3, angle=45):
     """
-    annotations: list of dicts with keys like type, x, y, content, color, size
+    In-memory counterpart of add_watermark: diagonal text centred on each page
+    """
+    stamp_doc(doc, watermark_text, font_size, opacity, angle)
+
+def add_watermark(input_path, output_path, watermark_text, font_size=40, opacity=0.3, angle=45):
+    """
+    Every page shows one shared watermark XObject (see utils.watermark)
     """
     doc = fitz.open(input_path)
+    stamp_doc(doc, watermark_text, font_size, opacity, angle)
+    doc.save(output_path)
+    doc.close()
+
+def open_for_output(input_path, output_path, incremental=False):
+    """
+    incremental: copy the original to output_path and edit the copy, so that
+    save_output only appends the changed objects to it. Earlier revisions
+    (e.g. previous signatures) stay byte-identical. Falls back to a normal
+    open when the file can't take an incremental update (repaired or
+    encrypted files).
+    """
+    if incremental:
+        shutil.copyfile(input_path, output_path)
+        doc = fitz.open(output_path)
+        if doc.can_save_incrementally() and not doc.needs_pass:
+            return doc
+        doc.close()
+    return fitz.open(input_path)
+
+def save_output(doc, output_path):
+    """
+    Counterpart of open_for_output
+    """
+    if doc.name == output_path:
+        doc.saveIncr()
+    else:
+        doc.save(output_path)
+    doc.close()
+
+def annotate_doc(doc, annotations):
+    """
+    annotations: list of dicts with keys like type, x, y, content, color, size
+    """
     for ann in annotations:
         try:
             page_num = int(ann.get("page", 1)) - 1
@@ -154,21 +219,22 @@ def annotate_pdf(input_path, output_path, annotations):
         except Exception as e:
             print(f"Error annotating: {e}")
             continue
-            
-    doc.save(output_path)
-    doc.close()
 
-def pdf_to_images(input_path, output_folder):
-    doc = fitz.open(input_path)
-    image_paths = []
-    for i in range(len(doc)):
-        page = doc[i]
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))  # 2x zoom for better quality
-        output_path = os.path.join(output_folder, f"page_{i+1}.jpg")
-        pix.save(output_path)
-        image_paths.append(output_path)
-    doc.close()
-    return image_paths
+def annotate_pdf(input_path, output_path, annotations, incremental=False):
+    """
+    annotations: list of dicts with keys like type, x, y, content, color, size
+    incremental: append the changes to a copy of the original (see open_for_output)
+    """
+    doc = open_for_output(input_path, output_path, incremental)
+    annotate_doc(doc, annotations)
+    save_output(doc, output_path)
+
+def pdf_to_images(input_path, output_folder, dpi=144, fmt='jpeg', quality=95, workers=None):
+    """
+    Render every page to an image in output_folder (144 DPI = the old 2x zoom).
+    fmt: 'jpeg', 'png' or 'webp'
+    """
+    return rasterize_pdf(input_path, output_folder, dpi=dpi, fmt=fmt, quality=quality, workers=workers)["paths"]
 
 def url_to_pdf(url, output_path):
     # This requires wkhtmltopdf installed on your system
@@ -186,14 +252,89 @@ def url_to_pdf(url, output_path):
         # If still failing, return False to trigger the informative HTTPException in app.py
         return False
 
-def extract_text(input_path):
-    reader = PdfReader(input_path)
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    return text
+def count_pages(input_path):
+    """
+    Page count of a PDF, 0 for anything that isn't one
+    """
+    if not input_path.lower().endswith('.pdf'):
+        return 0
+    try:
+        with fitz.open(input_path) as doc:
+            return doc.page_count
+    except Exception:
+        return 0
+
+def parse_page_ranges(pages):
+    """
+    pages: string like "1-3,5" (1-based, inclusive); returns sorted unique page numbers
+    """
+    page_set = set()
+    for part in pages.replace(' ', '').split(','):
+        if not part:
+            continue
+        if '-' in part:
+            start, end = map(int, part.split('-'))
+            page_set.update(range(start, end + 1))
+        else:
+            page_set.add(int(part))
+    return sorted(page_set)
+
+def iter_text(input_path, pages=None, backend='pypdf2'):
+    """
+    Iterator of (page_number, text), one page at a time.
+    pages: range string like "1-3,5", None for all
+    backend: 'pypdf2' or 'fitz' (much faster, slightly different whitespace)
+    The file is opened before this returns, so an unreadable or
+    password-protected one raises ValueError here rather than mid-iteration.
+    """
+    if backend == 'fitz':
+        try:
+            doc = fitz.open(input_path)
+        except fitz.FileDataError:
+            raise ValueError("Not a readable PDF")
+        if doc.needs_pass:
+            doc.close()
+            raise ValueError("Document is password protected")
+        page_count = len(doc)
+        get_text = lambda i: doc[i].get_text()
+        close = doc.close
+    elif backend == 'pypdf2':
+        try:
+            reader = PdfReader(input_path)
+            if reader.is_encrypted:
+                raise ValueError("Document is password protected")
+            page_count = len(reader.pages)
+        except PdfReadError:
+            raise ValueError("Not a readable PDF")
+        get_text = lambda i: reader.pages[i].extract_text()
+        close = lambda: None
+    else:
+        raise ValueError(f"Unknown text backend: {backend}")
+    numbers = parse_page_ranges(pages) if pages else range(1, page_count + 1)
+    return _iter_text(numbers, page_count, get_text, close)
+
+def _iter_text(numbers, page_count, get_text, close):
+    try:
+        for page_num in numbers:
+            if 1 <= page_num <= page_count:
+                yield page_num, get_text(page_num - 1)
+    finally:
+        close()
+
+def extract_text(input_path, pages=None, backend='pypdf2'):
+    return "".join(text + "\n" for _, text in iter_text(input_path, pages, backend))
 
-def add_password(input_path, output_path, password):
+def add_password(input_path, output_path, password, backend=None):
+    """
+    fitz writes AES-256 encryption, pypdf2 its default RC4-128
+    """
+    if choose_backend('add_password', backend) == 'pypdf2':
+        return _add_password_pypdf2(input_path, output_path, password)
+    doc = fitz.open(input_path)
+    doc.save(output_path, encryption=fitz.PDF_ENCRYPT_AES_256, user_pw=password, owner_pw=password)
+    doc.close()
+
+def _add_password_pypdf2(input_path, output_path, password):
     reader = PdfReader(input_path)
     writer = PdfWriter()
     for page in reader.pages:
@@ -202,43 +343,79 @@ def add_password(input_path, output_path, password):
     with open(output_path, "wb") as f:
         writer.write(f)
 
-def remove_password(input_path, output_path, password):
+def remove_password(input_path, output_path, password, backend=None):
+    """
+    Raises ValueError when the password doesn't open the file
+    """
+    if choose_backend('remove_password', backend) == 'pypdf2':
+        return _remove_password_pypdf2(input_path, output_path, password)
+    doc = fitz.open(input_path)
+    try:
+        if doc.needs_pass and not doc.authenticate(password):
+            raise ValueError("Incorrect password")
+        doc.save(output_path, encryption=fitz.PDF_ENCRYPT_NONE)
+    finally:
+        doc.close()
+
+def _remove_password_pypdf2(input_path, output_path, password):
     reader = PdfReader(input_path)
-    if reader.is_encrypted:
-        reader.decrypt(password)
+    if reader.is_encrypted and reader.decrypt(password) == PasswordType.NOT_DECRYPTED:
+        raise ValueError("Incorrect password")
     writer = PdfWriter()
     for page in reader.pages:
         writer.add_page(page)
     with open(output_path, "wb") as f:
         writer.write(f)
 
-def fill_form(input_path, output_path, form_data):
+def fill_form(input_path, output_path, form_data, incremental=False):
     """
     form_data: dict of field_name: value
+    incremental: append the changes to a copy of the original (see open_for_output)
     """
-    doc = fitz.open(input_path)
+    doc = open_for_output(input_path, output_path, incremental)
     for page in doc:
         for field in page.widgets():
             if field.field_name in form_data:
                 field.field_value = form_data[field.field_name]
                 field.update()
-    doc.save(output_path)
-    doc.close()
+    save_output(doc, output_path)
 
-def redact_text(input_path, output_path, text_to_redact):
-    doc = fitz.open(input_path)
-    for page in doc:
-        text_instances = page.search_for(text_to_redact)
+def find_text(doc, text, input_path=None, index=None, pages=None):
+    """
+    {0-based page: [fitz.Rect]} for every occurrence of text
+    index: a TextIndex to look the text up in instead of searching every
+    page; doc must then still have the page contents of input_path
+    pages: only look at these 0-based pages
+    """
+    if index is not None:
+        return {pno: hit_rects(doc[pno], hits) for pno, hits in index.search(input_path, text, pages).items()}
+    found = {}
+    for pno in range(doc.page_count) if pages is None else pages:
+        rects = doc[pno].search_for(text)
+        if rects:
+            found[pno] = rects
+    return found
+
+def redact_text_doc(doc, text_to_redact, input_path=None, index=None):
+    for pno, text_instances in find_text(doc, text_to_redact, input_path, index).items():
+        page = doc[pno]
         for inst in text_instances:
             page.add_redact_annot(inst)
         page.apply_redactions()
+
+def redact_text(input_path, output_path, text_to_redact, index=None):
+    """
+    index: optional TextIndex, so only the pages with hits are touched
+    """
+    doc = fitz.open(input_path)
+    redact_text_doc(doc, text_to_redact, input_path, index)
     doc.save(output_path)
     doc.close()
 
-def replace_text(input_path, output_path, old_text, new_text):
+def replace_text(input_path, output_path, old_text, new_text, index=None):
     doc = fitz.open(input_path)
-    for page in doc:
-        text_instances = page.search_for(old_text)
+    for pno, text_instances in find_text(doc, old_text, input_path, index).items():
+        page = doc[pno]
         for inst in text_instances:
             page.add_redact_annot(inst)
         page.apply_redactions()
@@ -249,16 +426,22 @@ def replace_text(input_path, output_path, old_text, new_text):
     doc.save(output_path)
     doc.close()
 
-def add_highlight(input_path, output_path, text_to_highlight, color=(1, 1, 0)):
-    doc = fitz.open(input_path)
-    for page in doc:
-        text_instances = page.search_for(text_to_highlight)
+def add_highlight_doc(doc, text_to_highlight, color=(1, 1, 0), input_path=None, index=None):
+    for pno, text_instances in find_text(doc, text_to_highlight, input_path, index).items():
+        page = doc[pno]
         for inst in text_instances:
             highlight = page.add_highlight_annot(inst)
             highlight.set_colors(stroke=color)
             highlight.update()
-    doc.save(output_path)
-    doc.close()
+
+def add_highlight(input_path, output_path, text_to_highlight, color=(1, 1, 0), incremental=False, index=None):
+    """
+    incremental: append the changes to a copy of the original (see open_for_output)
+    index: optional TextIndex, so only the pages with hits are touched
+    """
+    doc = open_for_output(input_path, output_path, incremental)
+    add_highlight_doc(doc, text_to_highlight, color, input_path, index)
+    save_output(doc, output_path)
 
 def add_text_stamp(input_path, output_path, text, position='center', font_size=20, color=(0,0,0), page_num=None):
     """
@@ -267,6 +450,11 @@ def add_text_stamp(input_path, output_path, text, position='center', font_size=2
     page_num: None for all pages, or specific page number (1-based)
     """
     doc = fitz.open(input_path)
+    add_text_stamp_doc(doc, text, position, font_size, color, page_num)
+    doc.save(output_path)
+    doc.close()
+
+def add_text_stamp_doc(doc, text, position='center', font_size=20, color=(0,0,0), page_num=None):
     pages = [doc[page_num - 1]] if page_num else doc
     for page in pages:
         page_width = page.rect.width
@@ -297,15 +485,17 @@ def add_text_stamp(input_path, output_path, text, position='center', font_size=2
             x = page_width / 2
             y = page_height / 2
         
-        page.insert_text((x, y), text, fontsize=font_size, color=color, align=fitz.TEXT_ALIGN_CENTER)
-    doc.save(output_path)
-    doc.close()
+        # insert_text has no alignment option, centre the line on x ourselves
+        x -= fitz.get_text_length(text, fontsize=font_size) / 2
+        insert_upright_text(page, (x, y), text, fontsize=font_size, color=color)
 
-def edit_text_in_pdf(input_path, output_path, changes):
+def edit_text_in_pdf(input_path, output_path, changes, index=None):
     """
     changes: list of dicts {'page': int, 'old_text': str, 'new_text': str}
+    index: optional TextIndex to find old_text in
     """
     doc = fitz.open(input_path)
+    edited = set()
     for change in changes:
         page_num = change['page'] - 1
         if page_num < 0 or page_num >= len(doc):
@@ -313,7 +503,10 @@ def edit_text_in_pdf(input_path, output_path, changes):
         page = doc[page_num]
         old_text = change['old_text']
         new_text = change['new_text']
-        text_instances = page.search_for(old_text)
+        # The index describes the original pages; search a page we already changed
+        page_index = None if page_num in edited else index
+        text_instances = find_text(doc, old_text, input_path, page_index, [page_num]).get(page_num, [])
+        edited.add(page_num)
         for inst in text_instances:
             page.add_redact_annot(inst)
         page.apply_redactions()
@@ -330,6 +523,11 @@ def add_page_numbers(input_path, output_path, start_page=1, position='bottom-rig
     position: 'bottom-left', 'bottom-center', 'bottom-right', 'top-left', 'top-center', 'top-right'
     """
     doc = fitz.open(input_path)
+    add_page_numbers_doc(doc, start_page, position, font_size, color)
+    doc.save(output_path)
+    doc.close()
+
+def add_page_numbers_doc(doc, start_page=1, position='bottom-right', font_size=12, color=(0,0,0)):
     for i, page in enumerate(doc):
         page_num = start_page + i
         page_width = page.rect.width
@@ -357,9 +555,8 @@ def add_page_numbers(input_path, output_path, start_page=1, position='bottom-rig
             x = page_width - 50
             y = page_height - 30
         
-        page.insert_text((x, y), str(page_num), fontsize=font_size, color=color, align=fitz.TEXT_ALIGN_CENTER)
-    doc.save(output_path)
-    doc.close()
+        x -= fitz.get_text_length(str(page_num), fontsize=font_size) / 2
+        insert_upright_text(page, (x, y), str(page_num), fontsize=font_size, color=color)
 
 def crop_pdf(input_path, output_path, left=0, top=0, right=None, bottom=None):
     """
@@ -368,20 +565,42 @@ def crop_pdf(input_path, output_path, left=0, top=0, right=None, bottom=None):
     If right/bottom None, use page dimensions
     """
     doc = fitz.open(input_path)
+    crop_doc(doc, left, top, right, bottom)
+    doc.save(output_path)
+    doc.close()
+
+def crop_doc(doc, left=0, top=0, right=None, bottom=None):
     for page in doc:
         page_width = page.rect.width
         page_height = page.rect.height
         right = right or page_width
         bottom = bottom or page_height
         page.set_cropbox(fitz.Rect(left, top, right, bottom))
-    doc.save(output_path)
-    doc.close()
 
-def reorder_pages(input_path, output_path, page_order):
+def reorder_pages_doc(doc, page_order):
+    """
+    page_order: list of 1-based page numbers; out-of-range entries are skipped
+    """
+    selection = [n - 1 for n in page_order if 1 <= n <= len(doc)]
+    if not selection:
+        raise ValueError("No pages selected")
+    doc.select(selection)
+
+def reorder_pages(input_path, output_path, page_order, backend=None):
     """
     Reorder PDF pages
     page_order: list of 1-based page numbers, e.g. [3,1,2]
     """
+    if choose_backend('reorder', backend) == 'pypdf2':
+        return _reorder_pages_pypdf2(input_path, output_path, page_order)
+    doc = fitz.open(input_path)
+    try:
+        reorder_pages_doc(doc, page_order)
+        doc.save(output_path, garbage=1)
+    finally:
+        doc.close()
+
+def _reorder_pages_pypdf2(input_path, output_path, page_order):
     reader = PdfReader(input_path)
     writer = PdfWriter()
     for page_num in page_order:
@@ -390,191 +609,122 @@ def reorder_pages(input_path, output_path, page_order):
     with open(output_path, "wb") as f:
         writer.write(f)
 
-def pdf_to_ppt(input_path, output_path):
+def pdf_to_ppt(input_path, output_path, slide_size='auto', workers=None):
     """
-    Convert PDF to PPT by extracting high-res images from each page
+    Convert PDF to PPT with one picture per page, fitted to the slide
+    slide_size: 'auto' (the document's page shape), '4:3' or '16:9'
+    workers: rendering processes, None for one per CPU (see utils.slides)
     """
-    from pptx import Presentation
-    
-    doc = fitz.open(input_path)
-    prs = Presentation()
-    
-    for i, page in enumerate(doc):
-        # High resolution (300 DPI approx)
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-        img_data = pix.tobytes("png")
-        img_stream = io.BytesIO(img_data)
-        
-        slide = prs.slides.add_slide(prs.slide_layouts[6])  # blank slide
-        
-        # Fit picture to slide
-        prs_width = prs.slide_width
-        prs_height = prs.slide_height
-        slide.shapes.add_picture(img_stream, 0, 0, width=prs_width, height=prs_height)
-    
-    prs.save(output_path)
-    doc.close()
+    return pdf_to_slides(input_path, output_path, slide_size, workers)
 
-def extract_pages(input_path, output_path, pages):
+def extract_pages(input_path, output_path, pages, backend=None):
     """
     Extract specific pages from PDF
     pages: list of 1-based page numbers or ranges like "1-3,5"
     """
+    if choose_backend('extract_pages', backend) == 'pypdf2':
+        return _extract_pages_pypdf2(input_path, output_path, pages)
+    doc = fitz.open(input_path)
+    try:
+        reorder_pages_doc(doc, parse_page_ranges(pages))
+        doc.save(output_path, garbage=1)
+    finally:
+        doc.close()
+
+def _extract_pages_pypdf2(input_path, output_path, pages):
     reader = PdfReader(input_path)
     writer = PdfWriter()
     
-    page_set = set()
-    for part in pages.replace(' ', '').split(','):
-        if '-' in part:
-            start, end = map(int, part.split('-'))
-            page_set.update(range(start, end + 1))
-        else:
-            page_set.add(int(part))
-    
-    for page_num in sorted(page_set):
+    for page_num in parse_page_ranges(pages):
         if 1 <= page_num <= len(reader.pages):
             writer.add_page(reader.pages[page_num - 1])
     
     with open(output_path, "wb") as f:
         writer.write(f)
 
-def compare_pdfs(path1, path2, output_path):
+def compare_pdfs(path1, path2, output_path, mode='text', workers=None):
     """
-    Compare two PDFs and highlight differences.
-    Text additions in path2 compared to path1 are highlighted green.
+    Compare two PDFs and highlight differences side by side.
+    Pages are aligned by content first; words removed from path1 are
+    highlighted red and words added in path2 green. mode='pixel' boxes
+    changed regions instead, for scans (see utils.compare).
     """
-    doc1 = fitz.open(path1)
-    doc2 = fitz.open(path2)
-    
-    # Simple strategy: Compare page by page text
-    for i in range(min(len(doc1), len(doc2))):
-        page1 = doc1[i]
-        page2 = doc2[i]
-        
-        text1 = page1.get_text().splitlines()
-        text2 = page2.get_text().splitlines()
-        
-        d = difflib.Differ()
-        diff = list(d.compare(text1, text2))
-        
-        for line in diff:
-            if line.startswith('+ '):
-                # Text added in doc2
-                added_text = line[2:].strip()
-                if added_text:
-                    text_instances = page2.search_for(added_text)
-                    for inst in text_instances:
-                        annot = page2.add_highlight_annot(inst)
-                        annot.set_colors(stroke=(0, 1, 0)) # Green
-                        annot.update()
-            # Deletions are harder to show on the NEW pdf without altering layout significantly
-                
-    doc2.save(output_path)
-    doc1.close()
-    doc2.close()
-
-def smart_redact(input_path, output_path, patterns):
-    """
-    patterns: list of strings like 'email', 'credit_card', 'phone'
-    """
-    regex_map = {
-        'email': r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+',
-        'credit_card': r'\b(?:\d[ -]*?){13,16}\b',
-        'phone': r'\b(?:\+?\d{1,3}[- ]?)?\(?\d{3}\)?[- ]?\d{3}[- ]?\d{4}\b'
-    }
-    
-    doc = fitz.open(input_path)
-    for page in doc:
-        for p_name in patterns:
-            pattern = regex_map.get(p_name, p_name) # allow custom regex too
-            # Use regex search since fitz search_for is not always regex-friendly
-            # Actually PyMuPDF has page.search_for which can take a regex if enabled, 
-            # but let's use the standard search_for with the literal strings if possible 
-            # or use a more advanced approach.
-            # For simplicity with the tools we have:
-            text_instances = page.search_for(pattern) # search_for supports regex in newer versions or treats as string
-            for inst in text_instances:
-                page.add_redact_annot(inst, fill=(0, 0, 0))
-        page.apply_redactions()
-        
-    doc.save(output_path)
-    doc.close()
+    return compare_files(path1, path2, output_path, mode, workers)
 
-def fake_scan(input_path, output_path):
+def smart_redact(input_path, output_path, patterns, index=None):
+    """
+    patterns: list of strings like 'email', 'credit_card', 'phone', or custom regexes
+    index: optional TextIndex to match the patterns against
+    """
+    return redact_patterns(input_path, output_path, patterns, index=index)
+
+def fake_scan(input_path, output_path, workers=None):
     """
     Make a PDF look like it was physically scanned.
+    workers: rendering processes, None for one per CPU
     """
-    doc = fitz.open(input_path)
-    images = []
-    
-    for page in doc:
-        # Convert page to high-res image
-        pix = page.get_pixmap(matrix=fitz.Matrix(2, 2))
-        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-        
-        # 1. Grayscale
-        img = ImageOps.grayscale(img)
-        
-        # 2. Add slight rotation (misalignment)
-        angle = random.uniform(-0.5, 0.5)
-        img = img.rotate(angle, resample=Image.BICUBIC, expand=False, fillcolor=255)
-        
-        # 3. Add noise/grain
-        img_array = np.array(img)
-        noise = np.random.normal(0, 2, img_array.shape).astype(np.uint8)
-        img_array = np.clip(img_array.astype(np.int16) + noise.astype(np.int16), 0, 255).astype(np.uint8)
-        img = Image.fromarray(img_array)
-        
-        # 4. Adjust contrast/brightness
-        img = ImageEnhance.Contrast(img).enhance(random.uniform(1.1, 1.3))
-        img = ImageEnhance.Brightness(img).enhance(random.uniform(0.95, 1.05))
-        
-        images.append(img)
-        
-    if images:
-        images[0].save(output_path, save_all=True, append_images=images[1:], resolution=150.0, quality=60)
-    doc.close()
+    return fake_scan_file(input_path, output_path, workers=workers)
+
+def booklet_order(num_pages):
+    """
+    Page indexes in booklet imposition order for a page count that is a
+    multiple of 4 (4 pages per sheet: 2 front, 2 back)
+    """
+    order = []
+    for i in range(num_pages // 4):
+        # Front side: Last-to-middle, First-from-middle
+        order.append(num_pages - (2*i) - 1)
+        order.append(2*i)
+        # Back side: First-from-middle+1, Last-to-middle-1
+        order.append(2*i + 1)
+        order.append(num_pages - (2*i) - 2)
+    return order
 
-def make_booklet(input_path, output_path):
+def make_booklet(input_path, output_path, backend=None):
     """
     Rearrange pages for booklet printing (imposition)
     """
+    if choose_backend('booklet', backend) == 'pypdf2':
+        return _make_booklet_pypdf2(input_path, output_path)
+    doc = fitz.open(input_path)
+    # Pad with blank pages the size of the first one to a multiple of 4
+    width, height = doc[0].mediabox.width, doc[0].mediabox.height
+    while doc.page_count % 4 != 0:
+        doc.new_page(width=width, height=height)
+    doc.select(booklet_order(doc.page_count))
+    doc.save(output_path, garbage=1)
+    doc.close()
+
+def _make_booklet_pypdf2(input_path, output_path):
     reader = PdfReader(input_path)
     pages = list(reader.pages)
     
     # Pad pages to multiple of 4
-    num_orig = len(pages)
     while len(pages) % 4 != 0:
         # Create a blank page for padding
         temp_writer = PdfWriter()
         temp_writer.add_blank_page(width=pages[0].mediabox.width, height=pages[0].mediabox.height)
         pages.append(temp_writer.pages[0])
     
-    num_pages = len(pages)
-    # The sequence for booklet imposition (4 pages per sheet: 2 front, 2 back)
-    booklet_order = []
-    for i in range(num_pages // 4):
-        # Front side: Last-to-middle, First-from-middle
-        booklet_order.append(num_pages - (2*i) - 1)
-        booklet_order.append(2*i)
-        # Back side: First-from-middle+1, Last-to-middle-1
-        booklet_order.append(2*i + 1)
-        booklet_order.append(num_pages - (2*i) - 2)
-        
     writer = PdfWriter()
-    for idx in booklet_order:
+    for idx in booklet_order(len(pages)):
         writer.add_page(pages[idx])
         
     with open(output_path, "wb") as f:
         writer.write(f)
 
-def remove_annotations(input_path, output_path):
+def remove_annotations(input_path, output_path, incremental=False):
     """
     Strip all highlights, notes, and other annotations from PDF.
+    incremental: append the changes to a copy of the original (see open_for_output).
+    The removed annotations then remain in the earlier revision, so only use it
+    when they don't need to be gone from the file.
     """
-    doc = fitz.open(input_path)
+    doc = open_for_output(input_path, output_path, incremental)
+    remove_annotations_doc(doc)
+    save_output(doc, output_path)
+
+def remove_annotations_doc(doc):
     for page in doc:
         for annot in page.annots():
             page.delete_annot(annot)
-    doc.save(output_path)
-    doc.close()
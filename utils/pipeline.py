@@ -0,0 +1,137 @@
+from utils.pdf_tools import rotate_doc, add_watermark_doc, add_page_numbers_doc, add_text_stamp_doc, crop_doc, redact_text_doc, add_highlight_doc, remove_annotations_doc, reorder_pages_doc
+from utils.compress import compress_doc
+import time, inspect, math
+import fitz  # PyMuPDF
+
+class PipelineError(ValueError):
+    pass
+
+def _compress_step(doc, preset='ebook'):
+    # Images are resampled now, the rest happens when the document is saved
+    save_options, resampled = compress_doc(doc, preset)
+    return save_options, {'images_resampled': resampled}
+
+def _text(value):
+    if not isinstance(value, str):
+        raise TypeError(f"expected a string, got {type(value).__name__}")
+    return value
+
+def _number(kind):
+    def convert(value):
+        if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+            raise TypeError(f"expected a number, got {type(value).__name__}")
+        number = float(value)
+        if not math.isfinite(number):
+            raise ValueError(f"expected a finite number, got {value!r}")
+        return kind(number)
+    return convert
+
+_int = _number(int)
+_float = _number(float)
+
+def _optional(convert):
+    return lambda value: None if value is None else convert(value)
+
+def _page_list(value):
+    if not isinstance(value, list):
+        raise TypeError(f"expected a list of page numbers, got {type(value).__name__}")
+    return [_int(n) for n in value]
+
+def _parse_color(value):
+    if isinstance(value, str):
+        value = value.lstrip('#')
+        if len(value) != 6:
+            raise ValueError(f"expected a #rrggbb colour, got {value!r}")
+        return tuple(int(value[i:i+2], 16)/255.0 for i in (0, 2, 4))
+    if not isinstance(value, (list, tuple)) or len(value) != 3:
+        raise TypeError("expected a #rrggbb colour or three numbers")
+    return tuple(_float(c) for c in value)
+
+# step name -> function taking the open fitz.Document plus the step's
+# parameters; it may return (save options, {stat name: count})
+STEPS = {
+    'rotate': rotate_doc,
+    'watermark': add_watermark_doc,
+    'page-numbers': add_page_numbers_doc,
+    'text-stamp': add_text_stamp_doc,
+    'crop': crop_doc,
+    'redact': redact_text_doc,
+    'highlight': add_highlight_doc,
+    'remove-annotations': remove_annotations_doc,
+    'reorder': reorder_pages_doc,
+    'compress': _compress_step,
+}
+
+# step name -> {parameter: converter}; converters raise TypeError or ValueError
+PARAMS = {
+    'rotate': {'rotation': _int},
+    'watermark': {'watermark_text': _text, 'font_size': _float, 'opacity': _float, 'angle': _float},
+    'page-numbers': {'start_page': _int, 'position': _text, 'font_size': _float, 'color': _parse_color},
+    'text-stamp': {'text': _text, 'position': _text, 'font_size': _float, 'color': _parse_color, 'page_num': _optional(_int)},
+    'crop': {'left': _float, 'top': _float, 'right': _optional(_float), 'bottom': _optional(_float)},
+    'redact': {'text_to_redact': _text},
+    'highlight': {'text_to_highlight': _text, 'color': _parse_color},
+    'remove-annotations': {},
+    'reorder': {'page_order': _page_list},
+    'compress': {'preset': _text},
+}
+
+def validate_steps(steps):
+    """
+    Check every step's operation, parameter names and parameter types.
+    Returns the steps with their parameters converted (e.g. "90" -> 90,
+    "#ff0000" -> (1.0, 0.0, 0.0)).
+    """
+    if not isinstance(steps, list) or not steps:
+        raise PipelineError("steps must be a non-empty list")
+    converted = []
+    for i, step in enumerate(steps):
+        if not isinstance(step, dict) or step.get('op') not in STEPS:
+            raise PipelineError(f"Step {i+1}: unknown operation {step.get('op') if isinstance(step, dict) else step!r}")
+        op = step['op']
+        params = {}
+        for name, value in step.items():
+            if name == 'op':
+                continue
+            if name not in PARAMS[op]:
+                raise PipelineError(f"Step {i+1} ({op}): unexpected parameter '{name}'")
+            try:
+                params[name] = PARAMS[op][name](value)
+            except (TypeError, ValueError) as e:
+                raise PipelineError(f"Step {i+1} ({op}): {name}: {e}")
+        try:
+            inspect.signature(STEPS[op]).bind(None, **params)
+        except TypeError as e:
+            raise PipelineError(f"Step {i+1} ({op}): {e}")
+        converted.append(dict(params, op=op))
+    return converted
+
+def run_pipeline(input_path, output_path, steps):
+    """
+    Open the document once, apply every step to it in memory and save once.
+    steps: list of dicts like {"op": "rotate", "rotation": 90}
+    Returns (timings, stats): a list of (name, seconds), one per step plus
+    the final save, and the counts steps reported, e.g. images_resampled.
+    """
+    steps = validate_steps(steps)
+    timings = []
+    stats = {}
+    save_options = {"garbage": 1}
+    doc = fitz.open(input_path)
+    try:
+        for step in steps:
+            params = {k: v for k, v in step.items() if k != 'op'}
+            started = time.perf_counter()
+            result = STEPS[step['op']](doc, **params)
+            timings.append((step['op'], time.perf_counter() - started))
+            if result is not None:
+                options, counts = result
+                save_options.update(options)
+                for name, count in counts.items():
+                    stats[name] = stats.get(name, 0) + count
+        started = time.perf_counter()
+        doc.save(output_path, **save_options)
+        timings.append(('save', time.perf_counter() - started))
+    finally:
+        doc.close()
+    return timings, stats
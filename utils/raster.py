@@ -0,0 +1,110 @@
+from PIL import Image
+from utils.parallel import default_workers, page_chunks, run_chunks
+import os, io, time
+import fitz  # PyMuPDF
+
+# format name -> file extension
+FORMATS = {'jpeg': 'jpg', 'jpg': 'jpg', 'png': 'png', 'webp': 'webp'}
+
+def encode_pixmap(pix, fmt='jpeg', quality=95):
+    fmt = fmt.lower()
+    if fmt == 'png':
+        return pix.tobytes("png")
+    if fmt in ('jpeg', 'jpg'):
+        return pix.tobytes("jpeg", jpg_quality=quality)
+    if fmt == 'webp':
+        # MuPDF has no WebP writer, hand the raw samples to Pillow
+        mode = "L" if pix.n == 1 else "RGB"
+        img = Image.frombytes(mode, [pix.width, pix.height], pix.samples)
+        buf = io.BytesIO()
+        img.save(buf, "WEBP", quality=quality)
+        return buf.getvalue()
+    raise ValueError(f"Unsupported image format: {fmt}")
+
+def _render_chunk(pages, input_path, dpi, fmt, quality, output_folder):
+    """
+    Runs in a worker process, which opens its own copy of the document.
+    Writes into output_folder and returns the paths, or returns
+    (name, bytes) pairs when output_folder is None.
+    """
+    ext = FORMATS[fmt]
+    doc = fitz.open(input_path)
+    results = []
+    for i in pages:
+        pix = doc[i].get_pixmap(dpi=dpi, alpha=False)
+        name = f"page_{i+1}.{ext}"
+        data = encode_pixmap(pix, fmt, quality)
+        if output_folder is None:
+            results.append((name, data))
+            continue
+        output_path = os.path.join(output_folder, name)
+        with open(output_path, "wb") as f:
+            f.write(data)
+        results.append(output_path)
+    doc.close()
+    return results
+
+def _select_pages(input_path, fmt, pages):
+    """
+    Raises ValueError for an unknown format or a file that can't be rendered
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported image format: {fmt}")
+    try:
+        doc = fitz.open(input_path)
+    except fitz.FileDataError:
+        raise ValueError("Not a readable PDF")
+    with doc:
+        if doc.needs_pass:
+            raise ValueError("Document is password protected")
+        page_count = len(doc)
+    if pages is None:
+        pages = range(page_count)
+    return [i for i in pages if 0 <= i < page_count]
+
+def iter_page_images(input_path, dpi=144, fmt='jpeg', quality=95, pages=None, workers=None, stats=None):
+    """
+    Iterator of (name, bytes) for each page in order, rendered across a
+    process pool with only a few small chunks in flight at a time. The file
+    is checked before this returns (ValueError, see _select_pages), so
+    callers can fail cleanly before they start streaming.
+    stats: optional dict filled with pages/seconds/pages_per_sec when done
+    """
+    fmt = fmt.lower()
+    pages = _select_pages(input_path, fmt, pages)
+    return _iter_page_images(input_path, dpi, fmt, quality, pages, workers, stats)
+
+def _iter_page_images(input_path, dpi, fmt, quality, pages, workers, stats):
+    started = time.perf_counter()
+    workers = workers or default_workers(limit=len(pages) // 4 or 1)
+    chunks = page_chunks(pages, workers, max_chunk=8)
+    count = 0
+    for chunk_images in run_chunks(_render_chunk, chunks, workers, input_path, dpi, fmt, quality, None):
+        for item in chunk_images:
+            count += 1
+            yield item
+    if stats is not None:
+        seconds = time.perf_counter() - started
+        stats.update(pages=count, seconds=seconds, pages_per_sec=count / seconds if seconds > 0 else 0.0)
+
+def rasterize_pdf(input_path, output_folder, dpi=144, fmt='jpeg', quality=95, pages=None, workers=None):
+    """
+    Render pages to image files, splitting page ranges across a process pool.
+    pages: list of 0-based page indexes, None for all
+    Returns {'paths', 'pages', 'seconds', 'pages_per_sec'}
+    """
+    fmt = fmt.lower()
+    pages = _select_pages(input_path, fmt, pages)
+    started = time.perf_counter()
+    workers = workers or default_workers(limit=len(pages) // 4 or 1)
+    chunks = page_chunks(pages, workers)
+    paths = []
+    for chunk_paths in run_chunks(_render_chunk, chunks, workers, input_path, dpi, fmt, quality, output_folder):
+        paths.extend(chunk_paths)
+    seconds = time.perf_counter() - started
+    return {
+        "paths": paths,
+        "pages": len(paths),
+        "seconds": seconds,
+        "pages_per_sec": len(paths) / seconds if seconds > 0 else 0.0,
+    }
@@ -0,0 +1,107 @@
+from utils.parallel import default_workers, page_chunks, run_chunks
+from utils.textindex import hit_rects
+import re
+import fitz  # PyMuPDF
+
+PATTERNS = {
+    'email': r'[a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+',
+    'credit_card': r'\b(?:\d[ -]*?){13,16}\b',
+    'phone': r'\b(?:\+?\d{1,3}[- ]?)?\(?\d{3}\)?[- ]?\d{3}[- ]?\d{4}\b'
+}
+
+def compile_patterns(patterns):
+    """
+    patterns: names from PATTERNS or custom regexes
+    Returns one compiled alternation so each page is scanned once.
+    """
+    sources = [PATTERNS.get(p, p) for p in patterns]
+    for source in sources:
+        re.compile(source)  # report a bad custom regex on its own
+    return re.compile("|".join(f"(?:{source})" for source in sources))
+
+def page_text_map(page):
+    """
+    Returns (text, boxes): the page text with one line per text line, and
+    for every character of it the fitz.Rect it occupies (None for the line
+    breaks we insert)
+    """
+    chars = []
+    boxes = []
+    for block in page.get_text("rawdict")["blocks"]:
+        for line in block.get("lines", ()):
+            for span in line["spans"]:
+                for char in span["chars"]:
+                    chars.append(char["c"])
+                    boxes.append(fitz.Rect(char["bbox"]))
+            chars.append("\n")
+            boxes.append(None)
+    return "".join(chars), boxes
+
+def match_rects(text, boxes, regex):
+    """
+    One rectangle per text line covered by each match
+    """
+    rects = []
+    for match in regex.finditer(text):
+        current = None
+        for box in boxes[match.start():match.end()]:
+            if box is None:
+                if current is not None:
+                    rects.append(current)
+                current = None
+            elif current is None:
+                current = fitz.Rect(box)
+            else:
+                current |= box
+        if current is not None:
+            rects.append(current)
+    return [r for r in rects if not r.is_empty]
+
+def _find_chunk(pages, input_path, regex_source):
+    # Runs in a worker process: text extraction and matching only
+    regex = re.compile(regex_source)
+    results = []
+    with fitz.open(input_path) as doc:
+        for i in pages:
+            text, boxes = page_text_map(doc[i])
+            rects = match_rects(text, boxes, regex)
+            if rects:
+                results.append((i, [tuple(r) for r in rects]))
+    return results
+
+def find_matches(input_path, patterns, workers=None):
+    """
+    Returns {page_index: [rect tuples]} for every page with at least one match
+    """
+    regex = compile_patterns(patterns)
+    with fitz.open(input_path) as doc:
+        page_count = len(doc)
+    workers = workers or default_workers(limit=page_count // 16 or 1)
+    matches = {}
+    for chunk in run_chunks(_find_chunk, page_chunks(range(page_count), workers, min_chunk=16), workers, input_path, regex.pattern):
+        matches.update(chunk)
+    return matches
+
+def redact_patterns(input_path, output_path, patterns, fill=(0, 0, 0), workers=None, index=None):
+    """
+    Scan pages in parallel, then add the redactions and apply them in a single
+    pass over only the pages that matched. Returns the number of areas redacted.
+    index: a TextIndex to match against instead of extracting every page
+    """
+    if index is not None:
+        hits = index.search_regex(input_path, compile_patterns(patterns))
+    else:
+        matches = find_matches(input_path, patterns, workers)
+    doc = fitz.open(input_path)
+    if index is not None:
+        matches = {i: hit_rects(doc[i], page_hits) for i, page_hits in hits.items()}
+    count = 0
+    for i, rects in sorted(matches.items()):
+        page = doc[i]
+        for rect in rects:
+            page.add_redact_annot(fitz.Rect(rect), fill=fill)
+        page.apply_redactions()
+        count += len(rects)
+    doc.save(output_path, garbage=1)
+    doc.close()
+    return count
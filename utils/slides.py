@@ -0,0 +1,160 @@
+"""
+PDF to PowerPoint, one picture per page.
+
+Each page is fitted inside the slide without distortion and rendered, on a
+process pool, at the resolution it has when the slide fills a DISPLAY
+screen. Pages are encoded as PNG or JPEG, whichever suits them: pages with
+few distinct colours (text, line art) stay sharp and small as PNG, and
+photographic ones go to JPEG. Pages without colour are stored in
+greyscale. Pages that draw the same content with the
+same resources at the same size are rendered once. python-pptx stores
+identical image bytes as one part, so the deck embeds them once too.
+"""
+from collections import Counter
+import hashlib, io
+import numpy as np
+import fitz  # PyMuPDF
+from PIL import Image
+from pptx import Presentation
+from pptx.util import Inches
+from utils.parallel import default_workers, page_chunks, run_chunks
+from utils.raster import encode_pixmap
+
+DISPLAY = (2560, 1440)  # pixels the slide is rendered to fill
+SLIDE_SIZES = {
+    '4:3': (Inches(10), Inches(7.5)),
+    '16:9': (Inches(13.333), Inches(7.5)),
+}
+JPEG_QUALITY = 85
+
+_AUTO_WIDTH = Inches(10)
+_MAX_SIDE = Inches(56)  # PowerPoint's largest slide
+_EMU_PER_INCH = 914400
+_EMU_PER_POINT = 12700
+_SAMPLE_STEP = 4  # sample every 4th pixel of every 4th row
+_PHOTO_COLORS = 4096  # distinct colours in the sample above which a page is photographic
+
+def slide_size(rects, size='auto'):
+    """
+    (width, height) in EMU. 'auto' matches the most common page shape.
+    """
+    if size != 'auto':
+        if size not in SLIDE_SIZES:
+            raise ValueError(f"Unknown slide size: {size}")
+        return SLIDE_SIZES[size]
+    if not rects:
+        return SLIDE_SIZES['4:3']
+    width, height = Counter((round(r.width), round(r.height)) for r in rects).most_common(1)[0][0]
+    if height * _AUTO_WIDTH / width > _MAX_SIDE:
+        return int(_MAX_SIDE * width / height), _MAX_SIDE
+    return _AUTO_WIDTH, int(_AUTO_WIDTH * height / width)
+
+def slide_ppi(width, height):
+    """
+    Pixels per slide inch when the slide fills DISPLAY
+    """
+    return min(DISPLAY[0] * _EMU_PER_INCH / width, DISPLAY[1] * _EMU_PER_INCH / height)
+
+def _fit(rect, width, height, ppi):
+    """
+    (left, top, width, height) in EMU of the page centred in the slide, and
+    the DPI that shows it at ppi
+    """
+    scale = min(width / rect.width, height / rect.height)  # EMU per point
+    w, h = int(rect.width * scale), int(rect.height * scale)
+    dpi = round(ppi * scale / _EMU_PER_POINT, 1)
+    return (width - w) // 2, (height - h) // 2, w, h, dpi
+
+def _page_key(doc, page, dpi):
+    """
+    Digest of everything that decides how the page renders. Duplicated pages
+    that share their resources (copy_page, fullcopy_page, repeated
+    templates) get the same digest.
+    """
+    digest = hashlib.sha1()
+    for xref in page.get_contents():
+        digest.update(doc.xref_stream(xref) or b"")
+    for key in ("Resources", "Annots", "Group"):
+        digest.update(repr(doc.xref_get_key(page.xref, key)).encode())
+    if doc.xref_get_key(page.xref, "Resources")[0] == "null":
+        digest.update(repr(doc.xref_get_key(page.xref, "Parent")).encode())  # inherited resources
+    digest.update(repr((tuple(page.mediabox), tuple(page.cropbox), page.rotation, dpi)).encode())
+    return digest.hexdigest()
+
+def _pixels(pix):
+    samples = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    return samples[:, :pix.width * pix.n].reshape(pix.height, pix.width, pix.n)
+
+def is_photographic(pix):
+    """
+    True when a sample of the pixmap has many distinct colours
+    """
+    pixels = _pixels(pix)[::_SAMPLE_STEP, ::_SAMPLE_STEP]
+    packed = pixels[..., 0].astype(np.uint32)
+    for channel in range(1, pix.n):
+        packed = (packed << 8) | pixels[..., channel]
+    return len(np.unique(packed)) > _PHOTO_COLORS
+
+def is_gray(pix):
+    """
+    True when every pixel of an RGB pixmap is a shade of grey
+    """
+    pixels = _pixels(pix)
+    return pix.n == 1 or (np.array_equal(pixels[..., 0], pixels[..., 1])
+                          and np.array_equal(pixels[..., 1], pixels[..., 2]))
+
+def _jpeg(pix):
+    # Pillow's libjpeg-turbo encodes about 4x faster than MuPDF's writer, and
+    # its chroma subsampling makes the file about a third smaller
+    mode = "L" if pix.n == 1 else "RGB"
+    buf = io.BytesIO()
+    Image.frombytes(mode, [pix.width, pix.height], pix.samples).save(buf, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buf.getvalue()
+
+def _render(tasks, input_path):
+    """
+    Worker: image bytes per (page, dpi) task
+    """
+    results = []
+    with fitz.open(input_path) as doc:
+        for pno, dpi in tasks:
+            pix = doc[pno].get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72), alpha=False)
+            if is_gray(pix):
+                pix = fitz.Pixmap(fitz.csGRAY, pix)
+            if is_photographic(pix):
+                results.append(_jpeg(pix))
+            else:
+                results.append(encode_pixmap(pix, 'png'))
+    return results
+
+def pdf_to_slides(input_path, output_path, size='auto', workers=None):
+    """
+    size: 'auto' (the document's page shape), '4:3' or '16:9'
+    Returns {'pages', 'rendered'}: slides written and distinct pages rendered.
+    """
+    placements, keys, tasks = [], [], {}
+    with fitz.open(input_path) as doc:
+        rects = [page.rect for page in doc]
+        width, height = slide_size(rects, size)
+        ppi = slide_ppi(width, height)
+        for page, rect in zip(doc, rects):
+            placement = _fit(rect, width, height, ppi)
+            key = _page_key(doc, page, placement[-1])
+            tasks.setdefault(key, (page.number, placement[-1]))
+            placements.append(placement)
+            keys.append(key)
+    unique = list(tasks.values())
+    workers = workers or default_workers(limit=len(unique) // 4 or 1)
+    chunks = page_chunks(unique, workers, max_chunk=8)
+    images = {}
+    for chunk, results in zip(chunks, run_chunks(_render, chunks, workers, input_path)):
+        images.update(zip(chunk, results))
+
+    prs = Presentation()
+    prs.slide_width, prs.slide_height = width, height
+    layout = prs.slide_layouts[6]  # blank
+    for key, (left, top, w, h, _) in zip(keys, placements):
+        slide = prs.slides.add_slide(layout)
+        slide.shapes.add_picture(io.BytesIO(images[tasks[key]]), left, top, width=w, height=h)
+    prs.save(output_path)
+    return {"pages": len(keys), "rendered": len(unique)}
@@ -0,0 +1,234 @@
+"""
+Split a PDF into parts.
+
+plan() works out which pages go into which part:
+    pages      one part per page
+    ranges     explicit ranges, one part each: "1-3,4-10,11"
+    chunk      every N pages
+    size       as many pages as fit in a byte budget, estimated from the
+               objects each page needs (shared fonts and images counted once)
+    bookmarks  one part per top-level outline entry, with its sub-outline
+
+write_parts() then builds the parts on a process pool with insert_pdf, which
+copies only the objects a page refers to. Pages whose /Resources dictionary
+is shared with other pages (some producers put every font and image of the
+file in one dictionary) are sanitized, so a part keeps only the resources
+its pages actually draw.
+"""
+import math, re
+import fitz  # PyMuPDF
+from utils.parallel import default_workers, run_chunks
+
+MODES = ('pages', 'ranges', 'chunk', 'size', 'bookmarks')
+
+_REF = re.compile(rb"(\d+) 0 R")
+_NAMED_REF = re.compile(rb"/([^\s/<>\[\]()]+)\s*(\d+) 0 R")
+_NAME = re.compile(rb"/([^\s/<>\[\]()]+)")
+# "n 0 obj" ... "endobj", stream keywords and the xref table entry
+_OBJECT_OVERHEAD = 60
+_RESOURCE_TYPES = ("Font", "XObject", "ExtGState", "ColorSpace", "Pattern", "Shading", "Properties")
+# Back-references that would pull the whole page tree into a page's estimate
+_BACKREF = re.compile(rb"/(Parent|P)\s+\d+ 0 R")
+
+def _range_name(pages):
+    first, last = pages[0] + 1, pages[-1] + 1
+    return f"pages_{first}.pdf" if first == last else f"pages_{first}-{last}.pdf"
+
+def _safe_title(title):
+    return re.sub(r"[^\w\- ]+", "", title).strip().replace(" ", "_")[:60] or "section"
+
+def _parse_ranges(ranges, page_count):
+    parts, covered = [], set()
+    for item in ranges.replace(" ", "").split(","):
+        if not item:
+            continue
+        start, _, end = item.partition("-")
+        start, end = int(start), int(end or start)
+        if not 1 <= start <= end <= page_count:
+            raise ValueError(f"Invalid range {item} for a {page_count}-page document")
+        # Parts are named after their range, so they must not overlap
+        pages = range(start - 1, end)
+        if covered.intersection(pages):
+            raise ValueError(f"Range {item} overlaps an earlier range")
+        covered.update(pages)
+        parts.append(list(pages))
+    return parts
+
+def _page_roots(doc, pno, pruned):
+    """
+    Objects a part needs for a page. For pages that will be sanitized that is
+    the content streams plus only the resources their content names.
+    """
+    xref = doc.page_xref(pno)
+    if pno not in pruned:
+        return [xref]
+    page = doc[pno]
+    contents = page.get_contents()
+    names = set(_NAME.findall(b"".join(doc.xref_stream(c) or b"" for c in contents)))
+    resources = int(doc.xref_get_key(xref, "Resources")[1].split()[0])
+    roots = list(contents)
+    for kind in _RESOURCE_TYPES:
+        entry_kind, value = doc.xref_get_key(resources, kind)
+        if entry_kind == "xref":
+            value = doc.xref_object(int(value.split()[0]), compressed=True)
+        elif entry_kind != "dict":
+            continue
+        roots.extend(int(x) for name, x in _NAMED_REF.findall(value.encode()) if name in names)
+    return roots
+
+def _page_objects(doc, roots, memo):
+    """
+    xrefs reachable from roots, with their sizes, memoized across pages
+    """
+    seen = {}
+    stack = list(roots)
+    while stack:
+        x = stack.pop()
+        if x in seen:
+            continue
+        entry = memo.get(x)
+        if entry is None:
+            source = doc.xref_object(x, compressed=True).encode()
+            size = len(source) + _OBJECT_OVERHEAD
+            if doc.xref_is_stream(x):
+                size += len(doc.xref_stream_raw(x) or b"")
+            children = [int(r) for r in _REF.findall(_BACKREF.sub(b"", source))]
+            entry = memo[x] = (size, children)
+        seen[x] = entry[0]
+        stack.extend(entry[1])
+    return seen
+
+def _by_size(doc, max_bytes):
+    parts, current, objects, total = [], [], set(), 0
+    memo = {}
+    pruned = shared_resources(doc)
+    for pno in range(doc.page_count):
+        page_objects = _page_objects(doc, _page_roots(doc, pno, pruned), memo)
+        extra = sum(size for x, size in page_objects.items() if x not in objects)
+        if current and total + extra > max_bytes:
+            parts.append(current)
+            current, objects, total = [], set(), 0
+            extra = sum(page_objects.values())
+        current.append(pno)
+        objects.update(page_objects)
+        total += extra
+    if current:
+        parts.append(current)
+    return parts
+
+def _by_bookmarks(doc):
+    """
+    [(title, pages, toc)] with toc rebased onto the part's own pages
+    """
+    toc = doc.get_toc(simple=True)
+    tops = [i for i, (level, _, page) in enumerate(toc) if level == 1 and page > 0]
+    if not tops:
+        raise ValueError("Document has no top-level bookmarks")
+    sections = []
+    first = toc[tops[0]][2] - 1
+    if first > 0:
+        sections.append(("front_matter", 0, []))
+    for n, i in enumerate(tops):
+        end = tops[n + 1] if n + 1 < len(tops) else len(toc)
+        sections.append((toc[i][1], toc[i][2] - 1, toc[i:end]))
+    sections.sort(key=lambda s: s[1])
+    parts = []
+    for n, (title, start, entries) in enumerate(sections):
+        stop = sections[n + 1][1] if n + 1 < len(sections) else doc.page_count
+        if stop <= start:
+            continue  # several bookmarks on one page: the last one gets it
+        rebased = []
+        for level, text, page in entries:
+            # Skip entries outside the part, and children left without a parent
+            if start < page <= stop and level <= (rebased[-1][0] + 1 if rebased else 1):
+                rebased.append([level, text, page - start])
+        parts.append((title, list(range(start, stop)), rebased))
+    return parts
+
+def plan(input_path, mode='pages', value=None):
+    """
+    value: the ranges string for 'ranges', pages per part for 'chunk',
+    bytes per part for 'size'; unused otherwise
+    Returns [(name, [0-based pages], toc)]; each part's pages are contiguous.
+    Raises ValueError for bad input.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown split mode: {mode}")
+    with fitz.open(input_path) as doc:
+        count = doc.page_count
+        if mode == 'pages':
+            return [(f"split_page_{i+1}.pdf", [i], []) for i in range(count)]
+        if mode == 'ranges':
+            if not value:
+                raise ValueError("ranges mode needs page ranges, e.g. 1-3,4-10")
+            return [(_range_name(p), p, []) for p in _parse_ranges(str(value), count)]
+        if mode == 'chunk':
+            size = int(value or 0)
+            if size < 1:
+                raise ValueError("chunk mode needs a chunk size of at least 1 page")
+            chunks = [list(range(i, min(i + size, count))) for i in range(0, count, size)]
+            return [(_range_name(p), p, []) for p in chunks]
+        if mode == 'size':
+            max_bytes = float(value or 0)
+            if not math.isfinite(max_bytes) or max_bytes < 1:
+                raise ValueError("size mode needs a size budget in bytes")
+            max_bytes = int(max_bytes)
+            return [(_range_name(p), p, []) for p in _by_size(doc, max_bytes)]
+        width = len(str(count))
+        return [(f"{n+1:0{width}d}_{_safe_title(title)}.pdf", pages, toc)
+                for n, (title, pages, toc) in enumerate(_by_bookmarks(doc))]
+
+def shared_resources(doc):
+    """
+    0-based pages whose /Resources is one indirect object used by several pages
+    """
+    owners = {}
+    for pno in range(doc.page_count):
+        kind, value = doc.xref_get_key(doc.page_xref(pno), "Resources")
+        if kind == "xref":
+            owners.setdefault(value, []).append(pno)
+    return {pno for pages in owners.values() if len(pages) > 1 for pno in pages}
+
+def _write_chunk(parts, input_path, prune):
+    """
+    Worker: [(name, bytes)] for a run of parts
+    """
+    results = []
+    with fitz.open(input_path) as src:
+        for name, pages, toc in parts:
+            part = fitz.open()
+            part.insert_pdf(src, from_page=pages[0], to_page=pages[-1])
+            for i, pno in enumerate(pages):
+                if pno in prune:
+                    part[i].clean_contents(sanitize=True)
+            if toc:
+                part.set_toc(toc)
+            results.append((name, part.tobytes(garbage=3, deflate=True)))
+            part.close()
+    return results
+
+def _tasks(parts, workers):
+    # Several parts per task so each worker opens the source once per run of
+    # pages, but never so many that one task holds much of the file in memory
+    total = sum(len(pages) for _, pages, _ in parts)
+    target = min(64, max(8, -(-total // (workers * 4))))
+    tasks, current, count = [], [], 0
+    for part in parts:
+        current.append(part)
+        count += len(part[1])
+        if count >= target:
+            tasks.append(current)
+            current, count = [], 0
+    if current:
+        tasks.append(current)
+    return tasks
+
+def write_parts(input_path, parts, workers=None):
+    """
+    Yield (name, bytes) per part of plan(), in order
+    """
+    workers = workers or default_workers()
+    with fitz.open(input_path) as doc:
+        prune = shared_resources(doc)
+    for results in run_chunks(_write_chunk, _tasks(parts, workers), workers, input_path, prune):
+        yield from results
@@ -0,0 +1,100 @@
+import os, uuid, hashlib, threading
+from utils.lifecycle import shard_path, find_path, touch
+
+CHUNK_SIZE = 1024 * 1024
+
+class UploadStore:
+    """
+    Content-addressed upload storage.
+    Uploads are hashed with SHA-256 while they stream to disk and stored once
+    as <digest><ext>, so identical bytes share one blob across every route.
+    Each save() takes a reference and release() drops it. Blobs are never
+    deleted here: the same bytes may be in use by a request or an editor
+    session in another worker process, which these per-process counts can't
+    see. The storage janitor removes blobs once they expire, skipping those
+    this process still references (in_use).
+    """
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._refs = {}
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, name):
+        return find_path(self.root, name)
+
+    def save(self, file):
+        """
+        file: werkzeug FileStorage (or anything with .stream and .filename)
+        Returns the blob path.
+        """
+        ext = os.path.splitext(file.filename or "")[1].lower()
+        digest = hashlib.sha256()
+        tmp_path = os.path.join(self.root, f".tmp_{uuid.uuid4().hex}")
+        with open(tmp_path, "wb") as f:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                f.write(chunk)
+        return self._commit(tmp_path, digest.hexdigest() + ext)
+
+    def save_bytes(self, data, ext=""):
+        tmp_path = os.path.join(self.root, f".tmp_{uuid.uuid4().hex}")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        return self._commit(tmp_path, hashlib.sha256(data).hexdigest() + ext)
+
+    def _commit(self, tmp_path, name):
+        path = self.path(name)
+        with self._lock:
+            if os.path.exists(path):
+                os.remove(tmp_path)
+                touch(path)  # restart its expiry
+            else:
+                path = shard_path(self.root, name, create=True)
+                os.replace(tmp_path, path)
+            self._refs[name] = self._refs.get(name, 0) + 1
+        return path
+
+    def acquire(self, name):
+        name = os.path.basename(name)
+        with self._lock:
+            self._refs[name] = self._refs.get(name, 0) + 1
+
+    def release(self, name):
+        """
+        Drop a reference; the blob stays on disk until the janitor expires it
+        """
+        name = os.path.basename(name)
+        with self._lock:
+            count = self._refs.get(name, 0) - 1
+            if count > 0:
+                self._refs[name] = count
+            else:
+                self._refs.pop(name, None)
+
+    def persist(self, name):
+        """
+        Hand a blob that outlives the request (editor sessions) to the
+        janitor: drop the reference, keep the blob. Returns the blob name.
+        """
+        self.release(name)
+        return os.path.basename(name)
+
+    def touch(self, name):
+        """
+        Mark a blob as recently used and return its path
+        """
+        path = self.path(name)
+        touch(path)
+        return path
+
+    def in_use(self, name):
+        with self._lock:
+            return self._refs.get(os.path.basename(name), 0) > 0
+
+    def refcount(self, name):
+        with self._lock:
+            return self._refs.get(os.path.basename(name), 0)
@@ -0,0 +1,101 @@
+from openpyxl import Workbook
+from utils.parallel import default_workers, page_chunks, run_chunks
+import os, csv, json
+import fitz  # PyMuPDF
+import pdfplumber
+
+OUTPUT_FORMATS = ('xlsx', 'csv', 'jsonl')
+
+def has_ruling_lines(page, min_edges=2):
+    """
+    pdfplumber's default strategy builds cells from drawn lines and rectangle
+    edges, so a page without both horizontal and vertical rules cannot yield
+    a table. Checking the vector drawings with fitz is far cheaper than
+    letting pdfplumber lay out the page.
+    """
+    horizontal = vertical = 0
+    for drawing in page.get_drawings():
+        for item in drawing["items"]:
+            if item[0] == "re":
+                horizontal += 2
+                vertical += 2
+            elif item[0] == "l":
+                p1, p2 = item[1], item[2]
+                if abs(p1.y - p2.y) < 1:
+                    horizontal += 1
+                elif abs(p1.x - p2.x) < 1:
+                    vertical += 1
+            if horizontal >= min_edges and vertical >= min_edges:
+                return True
+    return False
+
+def _tables_chunk(pages, input_path):
+    # Runs in a worker process: pre-filter with fitz, extract with pdfplumber
+    with fitz.open(input_path) as doc:
+        candidates = [i + 1 for i in pages if has_ruling_lines(doc[i])]
+    if not candidates:
+        return []
+    results = []
+    with pdfplumber.open(input_path, pages=candidates) as pdf:
+        for page in pdf.pages:
+            for table in page.extract_tables():
+                if table:
+                    results.append((page.page_number, table))
+            page.flush_cache()
+    return results
+
+def iter_tables(input_path, workers=None):
+    """
+    Yield (page_number, rows) for every table, in page order, with page
+    shards processed across a process pool
+    """
+    with fitz.open(input_path) as doc:
+        page_count = len(doc)
+    workers = workers or default_workers(limit=page_count // 8 or 1)
+    chunks = page_chunks(range(page_count), workers, min_chunk=8, max_chunk=32)
+    for tables in run_chunks(_tables_chunk, chunks, workers, input_path):
+        yield from tables
+
+def _unique_columns(header):
+    columns = []
+    for i, name in enumerate(header):
+        name = str(name) if name not in (None, "") else f"col{i+1}"
+        while name in columns:
+            name += "_"
+        columns.append(name)
+    return columns
+
+def write_tables(tables, output_path, fmt='xlsx'):
+    """
+    Stream tables to disk as they arrive. Returns the number of tables written.
+    xlsx: write-only workbook, one sheet per table (first row is the header)
+    csv: one file, each row prefixed with its table and page number
+    jsonl: one object per data row, keyed by the table's header
+    """
+    if fmt not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown table output format: {fmt}")
+    count = 0
+    if fmt == 'xlsx':
+        wb = Workbook(write_only=True)
+        for page_num, rows in tables:
+            count += 1
+            ws = wb.create_sheet(f"Table_{count}")
+            for row in rows:
+                ws.append(row)
+        if count:
+            wb.save(output_path)
+    else:
+        with open(output_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f) if fmt == 'csv' else None
+            for page_num, rows in tables:
+                count += 1
+                if fmt == 'csv':
+                    for row in rows:
+                        writer.writerow([count, page_num] + ["" if c is None else c for c in row])
+                    continue
+                columns = _unique_columns(rows[0])
+                for row in rows[1:]:
+                    f.write(json.dumps({"table": count, "page": page_num, "row": dict(zip(columns, row))}) + "\n")
+    if not count and os.path.exists(output_path):
+        os.remove(output_path)
+    return count
@@ -0,0 +1,244 @@
+"""
+Positional text index for uploaded documents.
+
+Every word of a document is stored once in a SQLite file, with its page,
+reading-order position, line and bounding box. Files are named after the
+upload they index. Uploads are content-addressed, so an index never goes
+stale and every later upload of the same bytes reuses it. Words are looked
+up through a table of lowercased terms: finding the pages that hold a
+phrase reads only the postings of its words, and only those pages are then
+loaded from SQLite or opened in the PDF.
+
+Matching follows page.search_for: case-insensitive, across line breaks, and
+a phrase may start or end inside a word. Hits on whole words use the stored
+boxes; hit_rects() finds the others with one search_for text page per
+page that has them.
+"""
+from collections import namedtuple
+from contextlib import closing
+from itertools import groupby
+import bisect, os, re, sqlite3, uuid
+import fitz  # PyMuPDF
+from utils.parallel import default_workers, page_chunks, run_chunks
+from utils.lifecycle import shard_path, touch
+
+SCHEMA_VERSION = 1
+_TABLES = """
+CREATE TABLE pages (page INTEGER PRIMARY KEY, a REAL, b REAL, c REAL, d REAL, e REAL, f REAL);
+CREATE TABLE terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE);
+CREATE TABLE words (page INTEGER, seq INTEGER, line INTEGER, term INTEGER, word TEXT,
+                    x0 REAL, y0 REAL, x1 REAL, y1 REAL, PRIMARY KEY (page, seq)) WITHOUT ROWID;
+"""
+# Built after the bulk insert, which is much faster than keeping it up to date
+_INDEXES = "CREATE INDEX words_term ON words (term, page);"
+_WORDS = "SELECT page, line, word, x0, y0, x1, y1 FROM words ORDER BY page, seq"
+_PAGE_WORDS = "SELECT line, word, x0, y0, x1, y1 FROM words WHERE page = ? ORDER BY seq"
+# page.search_for's defaults
+_SEARCH_FLAGS = fitz.TEXT_DEHYPHENATE | fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_MEDIABOX_CLIP
+
+# text: what matched on one line; rect: its box, estimated from character
+# positions unless whole; box: the words it touches; whole: it starts and
+# ends on word boundaries, so rect is exact
+Hit = namedtuple("Hit", "text rect box whole")
+
+def _extract(pages, input_path):
+    """
+    Worker: (page, rotation matrix, [(seq, line, word, x0, y0, x1, y1)]) per page
+    """
+    results = []
+    with fitz.open(input_path) as doc:
+        for pno in pages:
+            page = doc[pno]
+            words, lines = [], {}
+            for seq, (x0, y0, x1, y1, word, block_no, line_no, _) in enumerate(page.get_text("words")):
+                line = lines.setdefault((block_no, line_no), len(lines))
+                words.append((seq, line, word, x0, y0, x1, y1))
+            results.append((pno, tuple(page.rotation_matrix), words))
+    return results
+
+def _like(value):
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _estimate(word, box, start, end):
+    # Share of the word's width taken by characters start:end
+    x0, y0, x1, y1 = box
+    width = (x1 - x0) / max(1, len(word))
+    return (x0 + start * width, y0, x0 + end * width, y1)
+
+def _union(words):
+    boxes = [w[2:] for w in words]
+    return (min(b[0] for b in boxes), min(b[1] for b in boxes), max(b[2] for b in boxes), max(b[3] for b in boxes))
+
+def _page_hits(words, regex):
+    """
+    words: (line, word, x0, y0, x1, y1) in reading order
+    Returns [Hit], one per line of each match
+    """
+    parts, starts = [], []
+    offset, line = 0, None
+    for n, (word_line, word, *_) in enumerate(words):
+        if n:
+            parts.append(" " if word_line == line else "\n")
+            offset += 1
+        starts.append(offset)
+        parts.append(word)
+        offset += len(word)
+        line = word_line
+    text = "".join(parts)
+    hits = []
+    for match in regex.finditer(text):
+        if match.start() == match.end():
+            continue
+        first = bisect.bisect_right(starts, match.start()) - 1
+        last = bisect.bisect_right(starts, match.end() - 1) - 1
+        if first == last:
+            groups = [[first]]  # most matches sit inside one word
+        else:
+            groups = [list(g) for _, g in groupby(range(first, last + 1), key=lambda i: words[i][0])]
+        for group in groups:
+            i, j = group[0], group[-1]
+            word_start, word_end = starts[i], starts[j] + len(words[j][1])
+            start, end = max(match.start(), word_start), min(match.end(), word_end)
+            if start >= end:
+                continue
+            box = tuple(words[i][2:]) if i == j else _union(words[i:j + 1])
+            whole = start == word_start and end == word_end
+            rect = box
+            if not whole:
+                left = _estimate(words[i][1], words[i][2:], start - word_start, len(words[i][1]))
+                right = _estimate(words[j][1], words[j][2:], 0, end - starts[j])
+                rect = (left[0], box[1], right[2], box[3])
+            hits.append(Hit(text[start:end], rect, box, whole))
+    return hits
+
+def hit_rects(page, hits):
+    """
+    Exact rectangles on page for its hits, as page.search_for would return them
+    """
+    rects = {}
+    textpage = None
+    found = {}
+    for hit in hits:
+        if hit.whole:
+            rects.setdefault(hit.rect, fitz.Rect(hit.rect))
+            continue
+        if textpage is None:
+            # One extraction of the page, however many hits fall inside words
+            textpage = page.get_textpage(flags=_SEARCH_FLAGS)
+        if hit.text not in found:
+            found[hit.text] = page.search_for(hit.text, textpage=textpage)
+        box = fitz.Rect(hit.box)
+        matched = [r for r in found[hit.text] if (r.tl + r.br) / 2 in box] or [fitz.Rect(hit.rect)]
+        for rect in matched:
+            rects.setdefault(tuple(rect), rect)
+    return list(rects.values())
+
+class TextIndex:
+    """
+    One SQLite index per upload under root, built on first use.
+    Builds write to a temporary file and are renamed into place, so
+    processes sharing root never see a half-built index; two first uses at
+    once just build it twice.
+    """
+    def __init__(self, root, workers=None):
+        self.root = root
+        self.workers = workers
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, input_path):
+        return shard_path(self.root, f"{os.path.basename(input_path)}.v{SCHEMA_VERSION}.sqlite")
+
+    def ensure(self, input_path):
+        """
+        Index input_path unless that was done before; returns the index path
+        """
+        path = self.path(input_path)
+        if os.path.exists(path):
+            touch(path)
+            return path
+        return self.build(input_path)
+
+    def build(self, input_path):
+        path = shard_path(self.root, self.path(input_path), create=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with fitz.open(input_path) as doc:
+            page_count = doc.page_count
+        workers = self.workers or default_workers(limit=page_count // 16 or 1)
+        terms = {}
+        try:
+            with closing(sqlite3.connect(tmp_path)) as conn:
+                conn.executescript("PRAGMA journal_mode=OFF; PRAGMA synchronous=OFF;" + _TABLES)
+                chunks = page_chunks(range(page_count), workers, min_chunk=16)
+                for results in run_chunks(_extract, chunks, workers, input_path):
+                    for pno, matrix, words in results:
+                        conn.execute("INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)", (pno, *matrix))
+                        rows = []
+                        for seq, line, word, *box in words:
+                            term = terms.setdefault(word.lower(), len(terms) + 1)
+                            rows.append((pno, seq, line, term, word, *box))
+                        conn.executemany("INSERT INTO words VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.executemany("INSERT INTO terms VALUES (?, ?)", ((i, term) for term, i in terms.items()))
+                conn.executescript(_INDEXES)
+                conn.commit()
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def _connect(self, input_path):
+        return closing(sqlite3.connect(f"file:{self.ensure(input_path)}?mode=ro", uri=True))
+
+    def search(self, input_path, text, pages=None):
+        """
+        {0-based page: [Hit]} for every occurrence of text
+        pages: only look at these 0-based pages
+        """
+        tokens = text.lower().split()
+        if not tokens:
+            return {}
+        if len(tokens) == 1:
+            patterns = [f"%{_like(tokens[0])}%"]
+        else:
+            # Inner words must match whole; the first may end and the last
+            # may start a longer word
+            patterns = [f"%{_like(tokens[0])}"] + [_like(t) for t in tokens[1:-1]] + [f"{_like(tokens[-1])}%"]
+        query = " INTERSECT ".join(
+            "SELECT page FROM words WHERE term IN (SELECT id FROM terms WHERE term LIKE ? ESCAPE '\\')"
+            for _ in patterns)
+        regex = re.compile(r"\s+".join(re.escape(t) for t in tokens), re.IGNORECASE)
+        hits = {}
+        with self._connect(input_path) as conn:
+            candidates = {page for (page,) in conn.execute(query, patterns)}
+            if pages is not None:
+                candidates &= set(pages)
+            for pno in sorted(candidates):
+                rows = conn.execute(_PAGE_WORDS, (pno,)).fetchall()
+                found = _page_hits(rows, regex)
+                if found:
+                    hits[pno] = found
+        return hits
+
+    def search_regex(self, input_path, regex):
+        """
+        {0-based page: [Hit]} for every match of a compiled regex, run over
+        the indexed text (words separated by one space, lines by a newline)
+        """
+        hits = {}
+        with self._connect(input_path) as conn:
+            rows = conn.execute(_WORDS)
+            for pno, page_rows in groupby(rows, key=lambda row: row[0]):
+                found = _page_hits([row[1:] for row in page_rows], regex)
+                if found:
+                    hits[pno] = found
+        return hits
+
+    def visible(self, input_path, hits):
+        """
+        {0-based page: [rect tuple]} for hits, in the page's rotated
+        (as displayed) coordinates
+        """
+        with self._connect(input_path) as conn:
+            matrices = {pno: fitz.Matrix(*m) for pno, *m in conn.execute("SELECT * FROM pages")}
+        return {pno: [tuple(fitz.Rect(hit.rect) * matrices[pno]) for hit in page_hits]
+                for pno, page_hits in hits.items()}
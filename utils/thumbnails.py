@@ -0,0 +1,124 @@
+from PIL import Image
+import os, io, json, uuid, hashlib, threading
+import fitz  # PyMuPDF
+
+class ThumbnailCache:
+    """
+    Size-capped LRU cache of rendered thumbnails on disk.
+    Recency is the file mtime, refreshed on every hit, so the order survives
+    restarts and is shared by every worker process using the same folder.
+    """
+    def __init__(self, root, max_bytes=256 * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._size = sum(e.stat().st_size for e in os.scandir(root) if e.is_file())
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def put(self, key, data):
+        path = self._path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+        return path
+
+    def _evict(self):
+        # Caller holds self._lock; drop least recently used down to 90% of the cap
+        entries = []
+        for entry in os.scandir(self.root):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._size -= size
+
+def document_hash(path):
+    """
+    Uploads are already named after their SHA-256 digest, anything else is hashed
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if len(stem) == 64 and all(c in "0123456789abcdef" for c in stem):
+        return stem
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def render_thumbnail(input_path, page_index, scale=0.3, quality=75):
+    with fitz.open(input_path) as doc:
+        pix = doc[page_index].get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        return pix.tobytes("jpeg", jpg_quality=quality)
+
+def render_sprite(input_path, start=0, count=50, scale=0.3, columns=10, quality=75):
+    """
+    Render pages start..start+count-1 into one JPEG grid.
+    Every page gets a cell the size of the largest thumbnail in the batch.
+    Returns (jpeg bytes, layout dict)
+    """
+    with fitz.open(input_path) as doc:
+        page_count = len(doc)
+        pages = list(range(start, min(start + count, page_count)))
+        thumbs = []
+        for i in pages:
+            pix = doc[i].get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+            thumbs.append(Image.frombytes("RGB", [pix.width, pix.height], pix.samples))
+    cell_width = max((t.width for t in thumbs), default=1)
+    cell_height = max((t.height for t in thumbs), default=1)
+    columns = max(1, min(columns, len(thumbs) or 1))
+    rows = -(-len(thumbs) // columns) or 1
+    sheet = Image.new("RGB", (cell_width * columns, cell_height * rows), "white")
+    for n, thumb in enumerate(thumbs):
+        sheet.paste(thumb, ((n % columns) * cell_width, (n // columns) * cell_height))
+    buf = io.BytesIO()
+    sheet.save(buf, "JPEG", quality=quality)
+    layout = {
+        "page_count": page_count,
+        "start": start + 1,
+        "pages": len(thumbs),
+        "columns": columns,
+        "cell_width": cell_width,
+        "cell_height": cell_height,
+        "sizes": [[t.width, t.height] for t in thumbs],
+    }
+    return buf.getvalue(), layout
+
+def cached_thumbnail(cache, input_path, page_index, scale):
+    key = f"{document_hash(input_path)}_p{page_index}_s{scale:g}.jpg"
+    return cache.get(key) or cache.put(key, render_thumbnail(input_path, page_index, scale))
+
+def cached_sprite(cache, input_path, start, count, scale, columns):
+    key = f"{document_hash(input_path)}_sprite{start}+{count}_c{columns}_s{scale:g}"
+    image_path, layout_path = cache.get(key + ".jpg"), cache.get(key + ".json")
+    if image_path and layout_path:
+        with open(layout_path) as f:
+            return image_path, json.load(f)
+    data, layout = render_sprite(input_path, start, count, scale, columns)
+    cache.put(key + ".json", json.dumps(layout).encode("utf-8"))
+    return cache.put(key + ".jpg", data), layout
@@ -0,0 +1,119 @@
+"""
+Text watermarks drawn once and shared by every page.
+
+The watermark for a given text, style and page size is a one-page PDF,
+built on first use and kept in a per-process LRU. The first page of each
+geometry shows it with show_pdf_page, which copies it into the document as
+a form XObject plus a small placement wrapper and a "/fzFrm0 Do" content
+stream. Every later page with the same boxes and rotation gets references
+to that same wrapper and stream, so no page content is rewritten and a page
+costs the output a few bytes of dictionary entries.
+"""
+from functools import lru_cache
+import re
+import fitz  # PyMuPDF
+
+@lru_cache(maxsize=64)
+def overlay_bytes(text, width, height, rotation=0, font_size=40, opacity=0.3, angle=45, color=(0, 0, 0)):
+    """
+    One unrotated width x height page, as PDF bytes, carrying the text
+    centred and turned by angle degrees as it will look once the target
+    page's /Rotate of `rotation` is applied
+    """
+    doc = fitz.open()
+    page = doc.new_page(width=width, height=height)
+    page.set_rotation(rotation)
+    text_width = fitz.get_text_length(text, fontname="helv", fontsize=font_size)
+    center = fitz.Point(page.rect.width / 2, page.rect.height / 2)
+    origin = center + (-text_width / 2, font_size / 3)
+    page.insert_text(origin * page.derotation_matrix, text, fontname="helv", fontsize=font_size,
+                     color=color, fill_opacity=opacity, rotate=rotation,
+                     morph=(center * page.derotation_matrix, fitz.Matrix(angle)))
+    page.set_rotation(0)
+    data = doc.tobytes(garbage=1, deflate=True)
+    doc.close()
+    return data
+
+def _contents(doc, xref):
+    kind, value = doc.xref_get_key(xref, "Contents")
+    if kind == "array":
+        return value[1:-1].split(" 0 R")[:-1]
+    return [value.split()[0]] if kind == "xref" else []
+
+def _show(page, src):
+    """
+    First page of a geometry: let show_pdf_page do the work and return
+    (name, wrapper xref, content xref) for the pages that follow
+    """
+    doc = page.parent
+    page.show_pdf_page(page.rect, src, 0)
+    content_xref = int(_contents(doc, page.xref)[-1])
+    name = re.search(rb"/(\S+) Do", doc.xref_stream(content_xref)).group(1).decode()
+    wrapper = doc.xref_get_key(page.xref, f"Resources/XObject/{name}")
+    return name, int(wrapper[1].split()[0]), content_xref
+
+def _set_xobject(doc, xref, name, ref):
+    # xref_set_key cannot write through indirect objects, so find the
+    # dictionary that really holds the page's XObjects
+    target, path = xref, "Resources/"
+    kind, value = doc.xref_get_key(target, "Resources")
+    if kind == "xref":
+        target, path = int(value.split()[0]), ""
+    kind, value = doc.xref_get_key(target, path + "XObject")
+    if kind == "xref":
+        target, path = int(value.split()[0]), ""
+    else:
+        path += "XObject/"
+    doc.xref_set_key(target, path + name, ref)
+
+def _reuse(page, xref, placement):
+    """
+    Point the page at an existing wrapper and content stream. Returns False
+    when its resources are inherited or already use the name, in which case
+    the caller falls back to show_pdf_page.
+    """
+    doc = page.parent
+    name, wrapper_xref, content_xref = placement
+    if doc.xref_get_key(xref, "Resources")[0] not in ("xref", "dict"):
+        return False
+    kind, value = doc.xref_get_key(xref, f"Resources/XObject/{name}")
+    if kind != "null" and value != f"{wrapper_xref} 0 R":
+        return False
+    if not page.is_wrapped:
+        page.wrap_contents()
+    if kind == "null":  # else the page shares a resource dictionary already done
+        _set_xobject(doc, xref, name, f"{wrapper_xref} 0 R")
+    contents = _contents(doc, xref) + [str(content_xref)]
+    doc.xref_set_key(xref, "Contents", "[" + " ".join(f"{x.strip()} 0 R" for x in contents) + "]")
+    return True
+
+def stamp_doc(doc, text, font_size=40, opacity=0.3, angle=45, color=(0, 0, 0), pages=None):
+    """
+    Put the watermark over every page (or the 0-based pages given), upright
+    in the page's visible orientation whatever its /Rotate
+    """
+    color = tuple(color)
+    overlays = {}  # (width, height, rotation) -> open overlay document
+    placements = {}  # (mediabox, cropbox, rotation) -> (name, wrapper xref, content xref)
+    try:
+        for pno in range(doc.page_count) if pages is None else pages:
+            page = doc[pno]
+            rotation = page.rotation
+            # show_pdf_page loses the cropbox offset on rotated pages, so place
+            # the overlay in unrotated coordinates and put /Rotate back after
+            if rotation:
+                page.set_rotation(0)
+            geometry = (tuple(page.mediabox), tuple(page.cropbox), rotation)
+            placement = placements.get(geometry)
+            if placement is None or not _reuse(page, page.xref, placement):
+                key = (round(page.rect.width, 2), round(page.rect.height, 2), rotation)
+                src = overlays.get(key)
+                if src is None:
+                    src = fitz.open("pdf", overlay_bytes(text, *key, font_size, opacity, angle, color))
+                    overlays[key] = src
+                placements.setdefault(geometry, _show(page, src))
+            if rotation:
+                page.set_rotation(rotation)
+    finally:
+        for src in overlays.values():
+            src.close()
@@ -0,0 +1,63 @@
+from pdf2docx import Converter
+from utils.parallel import default_workers, page_chunks, run_chunks
+import time
+import fitz  # PyMuPDF
+
+# Passed to every pdf2docx call; one bad page shouldn't fail the whole document
+SETTINGS = {'ignore_page_error': True}
+
+def _parse_chunk(pages, input_path):
+    # Runs in a worker process; returns pdf2docx's serialisable page layouts
+    cv = Converter(input_path)
+    try:
+        settings = cv.default_settings
+        settings.update(SETTINGS)
+        cv.parse(pages=pages, **settings)
+        return cv.store()
+    finally:
+        cv.close()
+
+def _build_docx(layouts, input_path, output_path):
+    # Restores the parsed layouts into one Converter and writes the .docx;
+    # runs in a worker when there is a timeout so it can be abandoned too
+    cv = Converter(input_path)
+    try:
+        settings = cv.default_settings
+        settings.update(SETTINGS)
+        for data in layouts:
+            cv.restore(data)
+        cv.make_docx(output_path, **settings)
+    finally:
+        cv.close()
+
+def convert_to_docx(input_path, output_path, pages=None, workers=None, timeout=None):
+    """
+    Parse page chunks across a process pool and build one .docx from them.
+    pdf2docx's own multi_processing only handles a start/end range and writes
+    its intermediate files to the working directory, so chunks are parsed
+    here and their stored layouts restored into a single Converter instead.
+    pages: 1-based page numbers, None for all
+    timeout: seconds for the whole conversion, parsing and building the
+    .docx alike; raises TimeoutError
+    Returns the number of pages converted.
+    """
+    started = time.monotonic()
+    with fitz.open(input_path) as doc:
+        page_count = len(doc)
+    indexes = [p - 1 for p in pages if 1 <= p <= page_count] if pages else list(range(page_count))
+    if not indexes:
+        raise ValueError("No pages selected")
+    workers = workers or default_workers(limit=len(indexes) // 4 or 1)
+    chunks = page_chunks(indexes, workers, min_chunk=4)
+
+    layouts = list(run_chunks(_parse_chunk, chunks, workers, input_path, timeout=timeout))
+    remaining = None
+    if timeout is not None:
+        remaining = timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            raise TimeoutError(f"Gave up after {timeout} seconds")
+    try:
+        list(run_chunks(_build_docx, [layouts], 1, input_path, output_path, timeout=remaining))
+    except TimeoutError:
+        raise TimeoutError(f"Gave up after {timeout} seconds")
+    return len(indexes)
@@ -0,0 +1,48 @@
+import zipfile
+
+class _Sink:
+    """
+    Write-only, non-seekable file object that hands its buffer back to the
+    caller. zipfile falls back to data descriptors when it cannot seek, so
+    every entry can be sent as soon as it is written.
+    """
+    def __init__(self):
+        self._chunks = []
+        self._pos = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, *args):
+        raise OSError("stream is not seekable")
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def stream_zip(entries, compression=zipfile.ZIP_DEFLATED, comment=None):
+    """
+    entries: iterable of (name, bytes)
+    comment: optional callable returning the archive comment, evaluated
+    after the last entry (e.g. to record timings)
+    Yields the archive in pieces, one or more per entry.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, "w", compression=compression, allowZip64=True) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+        if comment is not None:
+            zf.comment = comment().encode("utf-8")[:65535]
+    yield sink.take()